@@ -0,0 +1,193 @@
+import os
+import json
+import pygame
+from pygame.locals import *
+from settings import ATLAS
+
+main_dir = os.path.split(os.path.abspath(__file__))[0]
+data_dir = os.path.join(main_dir, 'data')
+
+# frames of animations as (file, transform), atlas.py packs them too
+animations = {
+    'explosion': [('explosion.gif', None), ('explosion.gif', 'flip')],
+}
+transforms = {
+    'flip': lambda image: pygame.transform.flip(image, 1, 1),
+}
+
+
+def frame_name(name, transform=None):
+    """Name of an animation frame in the atlas index."""
+    return name if transform is None else '{}:{}'.format(name, transform)
+
+
+class ImageCache:
+    """
+    Keeps every image decoded and converted only once.
+
+    Surfaces are keyed by file name and conversion variant, so spawning
+    a sprite costs a dictionary lookup. hits and misses count lookups
+    that were served from memory and lookups that had to go to disk.
+
+    With an atlas index (written by atlas.py) its image is decoded and
+    converted once and images it contains are handed out as its
+    subsurfaces, other images are still loaded from their files.
+    """
+    extensions = ('.gif', '.png')
+
+    def __init__(self, directory, atlas=None):
+        self.directory = directory
+        self.atlas = atlas
+        self.sprites = None
+        self.animations = {}
+        self.surfaces = {}
+        self.hits = 0
+        self.misses = 0
+
+    def preload(self, names=None):
+        """Loads given images (by default all images from directory)."""
+        if names is None:
+            skip = set(self._atlas_files())
+            names = sorted(name for name in os.listdir(self.directory)
+                           if name.endswith(self.extensions)
+                           and name not in skip)
+        for name in names:
+            key = (name, False, None)
+            if key not in self.surfaces:
+                self.surfaces[key] = self._load(name, False, None)
+
+    def get(self, name, alpha=False, colorkey=None):
+        """
+        Returns shared surface for the image.
+
+        alpha -- convert with per pixel alpha instead of display format
+        colorkey -- color that should be transparent
+        """
+        key = (name, alpha, colorkey)
+        try:
+            surface = self.surfaces[key]
+        except KeyError:
+            self.misses += 1
+            surface = self.surfaces[key] = self._load(name, alpha, colorkey)
+        else:
+            self.hits += 1
+        return surface
+
+    def frames(self, name):
+        """
+        Frames of animation name.
+
+        An atlas lists the frames it packed for the animation, without
+        one they are made from the files as animations says.
+        """
+        key = (name, 'frames')
+        frames = self.surfaces.get(key)
+        if frames is None:
+            sprites = self._sprites()
+            packed = self.animations.get(name)
+            if packed is not None:
+                frames = [sprites[frame] for frame in packed]
+            else:
+                frames = []
+                for file, transform in animations[name]:
+                    frame = self.get(file)
+                    if transform is not None:
+                        frame = transforms[transform](frame)
+                    frames.append(frame)
+            self.surfaces[key] = frames
+        return frames
+
+    def mask(self, name):
+        """
+        Collision mask of the image, computed once.
+
+        Variants and pulse frames of an image keep its shape, so they
+        share its mask.
+        """
+        key = (name, 'mask')
+        mask = self.surfaces.get(key)
+        if mask is None:
+            mask = pygame.mask.from_surface(self.get(name))
+            self.surfaces[key] = mask
+        return mask
+
+    def pulse(self, name, background, low=63, high=255, step=4):
+        """
+        Frames of the image fading in from low to high alpha.
+
+        Frames are blended onto background color once and keep the
+        image's colorkey, so drawing them needs no alpha blending.
+        Frame for alpha is at index (alpha - low) // step.
+        """
+        key = (name, 'pulse', background, low, high, step)
+        frames = self.surfaces.get(key)
+        if frames is None:
+            image = self.get(name)
+            colorkey = image.get_colorkey()
+            mask = pygame.mask.from_surface(image)
+            faded = image.copy()
+            frames = []
+            for alpha in range(low, high + 1, step):
+                frame = mask.to_surface(setcolor=background,
+                                        unsetcolor=colorkey or background)
+                if pygame.display.get_surface() is not None:
+                    frame = frame.convert()
+                faded.set_alpha(alpha)
+                frame.blit(faded, (0, 0))
+                if colorkey is not None:
+                    frame.set_colorkey(colorkey, RLEACCEL)
+                frames.append(frame)
+            self.surfaces[key] = frames
+        return frames
+
+    def _atlas_files(self):
+        if self.atlas is None:
+            return []
+        return [self.atlas, os.path.splitext(self.atlas)[0] + '.png']
+
+    def _sprites(self):
+        """Subsurfaces of the atlas by name, empty without an atlas."""
+        if self.sprites is None:
+            self.sprites = {}
+            path = self.atlas and os.path.join(self.directory, self.atlas)
+            if path and os.path.exists(path):
+                with open(path) as f:
+                    index = json.load(f)
+                sheet = pygame.image.load(os.path.join(self.directory,
+                                                       index['image']))
+                if pygame.display.get_surface() is not None:
+                    sheet = sheet.convert()
+                sheet.set_colorkey(index['colorkey'], RLEACCEL)
+                self.sprites = {name: sheet.subsurface(rect) for name, rect
+                                in index['sprites'].items()}
+                self.animations = index['animations']
+        return self.sprites
+
+    def _load(self, name, alpha, colorkey):
+        base = self.surfaces.get((name, False, None))
+        if base is None:
+            base = self._sprites().get(name)
+            if base is None:
+                image_path = os.path.join(self.directory, name)
+                try:
+                    base = pygame.image.load(image_path)
+                except pygame.error:
+                    print('Cannot load image, path: {}'.format(image_path))
+                    raise SystemExit(str(pygame.get_error()))
+                if pygame.display.get_surface() is not None:
+                    base = base.convert()
+            self.surfaces[(name, False, None)] = base
+            if not alpha and colorkey is None:
+                return base
+        if pygame.display.get_surface() is None:
+            image = base.copy()
+        elif alpha:
+            image = base.convert_alpha()
+        else:
+            image = base.convert()
+        if colorkey is not None:
+            image.set_colorkey(colorkey, RLEACCEL)
+        return image
+
+
+images = ImageCache(data_dir, ATLAS)
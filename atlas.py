@@ -0,0 +1,118 @@
+import os
+import sys
+import json
+import argparse
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import pygame
+from assets import data_dir, animations, transforms, frame_name, ImageCache
+from settings import ATLAS
+
+# transparent pixels of the atlas, the first one no image uses wins
+COLORKEYS = [(255, 0, 138), (255, 0, 255), (0, 255, 255), (1, 2, 3)]
+
+
+def sources(directory, skip=()):
+    """Images of directory and animation frames to pack, by name."""
+    images = {}
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(ImageCache.extensions) and name not in skip:
+            images[name] = pygame.image.load(os.path.join(directory, name))
+    for frames in animations.values():
+        for name, transform in frames:
+            if transform is not None:
+                images[frame_name(name, transform)] = \
+                    transforms[transform](images[name])
+    return images
+
+
+def pack(sizes, padding=1):
+    """
+    Places rectangles of sizes on shelves.
+
+    Tallest rectangles go first, a shelf is filled left to right up to
+    a power of two width. Returns the width, height and positions in
+    the order of sizes.
+    """
+    area = sum((w + padding) * (h + padding) for w, h in sizes)
+    width = 64
+    while width * width < area or width < max(w for w, h in sizes) + padding:
+        width *= 2
+    order = sorted(range(len(sizes)), key=lambda i: (-sizes[i][1], i))
+    positions = [None] * len(sizes)
+    x = y = shelf = 0
+    for i in order:
+        w, h = sizes[i]
+        if x + w > width:
+            x = 0
+            y += shelf + padding
+            shelf = 0
+        positions[i] = (x, y)
+        x += w + padding
+        shelf = max(shelf, h)
+    return width, y + shelf, positions
+
+
+def build(images, padding=1):
+    """
+    Draws images into one sheet and returns it with its index.
+
+    Transparent pixels of every image (its colorkey) become the sheet's
+    colorkey, which is a color that no image uses for visible pixels.
+    """
+    names = list(images)
+    width, height, positions = pack(
+        [images[name].get_size() for name in names], padding)
+    for colorkey in COLORKEYS:
+        sheet = pygame.Surface((width, height))
+        sheet.fill(colorkey)
+        for name, position in zip(names, positions):
+            sheet.blit(images[name], position)
+        if all(_keeps_pixels(sheet, images[name], position, colorkey)
+               for name, position in zip(names, positions)):
+            break
+    else:
+        raise SystemExit('no free colorkey for the atlas')
+    index = {
+        'colorkey': list(colorkey),
+        'sprites': {name: [x, y] + list(images[name].get_size())
+                    for name, (x, y) in zip(names, positions)},
+        'animations': {name: [frame_name(*frame) for frame in frames]
+                       for name, frames in animations.items()},
+    }
+    return sheet, index
+
+
+def _keeps_pixels(sheet, image, position, colorkey):
+    """Whether only transparent pixels of image turned into colorkey."""
+    rect = pygame.Rect(position, image.get_size())
+    keyed = pygame.mask.from_threshold(sheet.subsurface(rect), colorkey,
+                                       (1, 1, 1, 255))
+    visible = pygame.mask.from_surface(image)
+    return keyed.count() + visible.count() == rect.width * rect.height and \
+        not keyed.overlap(visible, (0, 0))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Pack images of data/ into one atlas image and index.')
+    parser.add_argument('-d', '--directory', default=data_dir)
+    parser.add_argument('-o', '--output', default=ATLAS,
+                        help='index file name, image gets .png')
+    parser.add_argument('-p', '--padding', type=int, default=1)
+    args = parser.parse_args()
+
+    pygame.display.init()
+    image_name = os.path.splitext(args.output)[0] + '.png'
+    images = sources(args.directory, skip=(args.output, image_name))
+    sheet, index = build(images, args.padding)
+    index['image'] = image_name
+    pygame.image.save(sheet, os.path.join(args.directory, image_name))
+    with open(os.path.join(args.directory, args.output), 'w') as f:
+        json.dump(index, f, separators=(',', ':'), sort_keys=True)
+    print('{} images in a {}x{} atlas, {}'.format(
+        len(images), sheet.get_width(), sheet.get_height(), image_name))
+
+if __name__ == '__main__':
+    main()
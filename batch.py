@@ -0,0 +1,97 @@
+import os
+import csv
+import sys
+import time
+import argparse
+import itertools
+import collections
+from concurrent.futures import ProcessPoolExecutor
+from simulation import Simulation, policies
+
+Session = collections.namedtuple(
+    'Session', 'seed difficulty policy max_frames')
+Result = collections.namedtuple(
+    'Result', Session._fields + ('score', 'level', 'kills', 'bonuses',
+                                 'frames', 'seconds'))
+
+
+def _init_worker():
+    """Imports pygame once per worker, without a window."""
+    os.environ['SDL_VIDEODRIVER'] = 'dummy'
+    import pygame
+    pygame.display.init()
+
+
+def play(session):
+    """Plays one session to the end and returns its Result."""
+    start = time.perf_counter()
+    simulation = Simulation(session.difficulty, session.seed)
+    state = simulation.run(policies[session.policy], session.max_frames)
+    simulation.end()
+    return Result(*session, score=state.score, level=state.level,
+                  kills=state.kills, bonuses=state.bonuses,
+                  frames=state.frame,
+                  seconds=round(time.perf_counter() - start, 4))
+
+
+def run_batch(sessions, output, workers=None):
+    """
+    Spreads sessions over a process pool and streams results to output.
+
+    Every worker process holds one game at a time, because game objects
+    keep their state on classes. Results are written as CSV rows in the
+    order of sessions, as soon as they are ready.
+    """
+    sessions = list(sessions)
+    workers = workers or os.cpu_count()
+    chunksize = max(1, len(sessions) // (workers * 4))
+    writer = csv.writer(output)
+    writer.writerow(Result._fields)
+    with ProcessPoolExecutor(workers, initializer=_init_worker) as pool:
+        for result in pool.map(play, sessions, chunksize=chunksize):
+            writer.writerow(result)
+            output.flush()
+            yield result
+
+
+def sessions_from_args(args):
+    """Every combination of difficulty and policy, for count seeds each."""
+    combinations = itertools.product(args.difficulty, args.policy,
+                                     range(args.seed, args.seed + args.count))
+    for difficulty, policy, seed in combinations:
+        yield Session(seed, difficulty, policy, args.max_frames)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run headless sessions '
+                                     'in parallel and collect results.')
+    parser.add_argument('-n', '--count', type=int, default=8,
+                        help='sessions per difficulty and policy')
+    parser.add_argument('-s', '--seed', type=int, default=0,
+                        help='seed of the first session')
+    parser.add_argument('-d', '--difficulty', nargs='+', default=['EASY'])
+    parser.add_argument('-p', '--policy', nargs='+', default=['dodge'],
+                        choices=sorted(policies))
+    parser.add_argument('-f', '--max-frames', type=int, default=36000)
+    parser.add_argument('-w', '--workers', type=int, default=None)
+    parser.add_argument('-o', '--output', default='-',
+                        help='CSV file, - for stdout')
+    args = parser.parse_args()
+
+    output = sys.stdout if args.output == '-' else \
+        open(args.output, 'w', newline='')
+    start = time.perf_counter()
+    frames = 0
+    try:
+        for result in run_batch(sessions_from_args(args), output,
+                                args.workers):
+            frames += result.frames
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    elapsed = time.perf_counter() - start
+    print('{} frames in {:.2f} s, {:.0f} frames/s'.format(
+        frames, elapsed, frames / elapsed), file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,428 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import collections
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import pygame
+from settings import window
+
+main_dir = os.path.split(os.path.abspath(__file__))[0]
+BASELINE = os.path.join(main_dir, 'bench_baseline.json')
+
+Stats = collections.namedtuple('Stats', 'ops_per_sec p50 p99 ops')
+
+scenarios = collections.OrderedDict()
+
+
+def scenario(name):
+    """
+    Registers a benchmark scenario.
+
+    Decorated function prepares the scenario and returns a callable that
+    performs one operation (usually one frame of work).
+    """
+    def register(setup):
+        scenarios[name] = setup
+        return setup
+    return register
+
+
+def measure(operation, seconds=0.5, min_ops=20):
+    """Repeats operation for about seconds and returns its Stats."""
+    times = []
+    clock = time.perf_counter
+    end = clock() + seconds
+    while clock() < end or len(times) < min_ops:
+        start = clock()
+        operation()
+        times.append(clock() - start)
+    total = sum(times)
+    times.sort()
+    return Stats(ops_per_sec=len(times) / total,
+                 p50=times[len(times) // 2] * 1000,
+                 p99=times[min(len(times) - 1, len(times) * 99 // 100)] * 1000,
+                 ops=len(times))
+
+
+def _surface():
+    return pygame.display.get_surface() or pygame.display.set_mode(window)
+
+
+def _starfield(numstars, layers=1):
+    from starfield import StarField
+    surface = _surface()
+    stars = StarField(numstars, layers, seed=1)
+
+    def operation():
+        stars.erase(surface)
+        stars.move()
+        stars.draw(surface)
+    return operation
+
+for _numstars in 200, 2000, 20000:
+    scenario('starfield_{}'.format(_numstars))(
+        lambda numstars=_numstars: _starfield(numstars))
+
+
+def _groups():
+    """Fresh groups assigned to all sprite classes."""
+    from simulation import Simulation
+    simulation = Simulation(seed=1)
+    simulation.player.kill()
+    return simulation
+
+
+@scenario('spawn_sprites')
+def _spawn():
+    from game_objects import PlayerBeam, EnemyFactory, Explosion
+    simulation = _groups()
+    enemy = EnemyFactory._Enemy
+
+    def operation():
+        for i in range(10):
+            PlayerBeam.create((100, 100))
+            Explosion.create(enemy.create('mid_enemy', (500, 7), 2))
+        simulation.end()
+    return operation
+
+
+def _collision(enemies, beams, masks=False, grid=True):
+    """
+    Player beams against enemies spread over the enemy tracks.
+
+    With masks rect hits are checked pixel by pixel, without grid every
+    pair goes to pygame.sprite.groupcollide and its collide_mask.
+    """
+    import collision
+    from game_objects import PlayerBeam, EnemyFactory
+    simulation = _groups()
+    rng = random.Random(1)
+    for i in range(enemies):
+        EnemyFactory._Enemy('basic_enemy', (rng.randrange(window.width),
+            rng.choice(EnemyFactory.enemy_tracks)), 1)
+    for i in range(beams):
+        PlayerBeam((rng.randrange(window.width),
+                    rng.randrange(window.height)))
+    collided = collision.collide_mask if masks else None
+
+    def operation():
+        simulation.enemies.refresh()
+        simulation.player_beams.refresh()
+        if grid:
+            collision.groupcollide(simulation.enemies,
+                                   simulation.player_beams, 0, 0, collided)
+        else:
+            pygame.sprite.groupcollide(simulation.enemies,
+                                       simulation.player_beams, 0, 0,
+                                       pygame.sprite.collide_mask)
+    return operation
+
+for _enemies, _beams in (5, 3), (50, 50), (200, 500):
+    scenario('collision_{}x{}'.format(_enemies, _beams))(
+        lambda enemies=_enemies, beams=_beams: _collision(enemies, beams))
+    scenario('collision_masks_{}x{}'.format(_enemies, _beams))(
+        lambda enemies=_enemies, beams=_beams: _collision(
+            enemies, beams, masks=True))
+scenario('collision_naive_50x50')(
+    lambda: _collision(50, 50, masks=True, grid=False))
+
+
+def _sprites(count):
+    from game_objects import EnemyFactory
+    from render import Renderer
+    from starfield import StarField
+    simulation = _groups()
+    rng = random.Random(1)
+    for i in range(count):
+        EnemyFactory._Enemy('basic_enemy', (rng.randrange(window.width),
+                                            rng.randrange(window.height)), 1)
+    renderer = Renderer(_surface(), StarField(0))
+    renderer.reset()
+
+    def operation():
+        # enemies that left the screen are replaced to keep count stable
+        simulation.all.update()
+        for i in range(count - len(simulation.enemies)):
+            EnemyFactory._Enemy.create('basic_enemy', (window.width,
+                                rng.randrange(window.height)), 1)
+        renderer.draw(simulation.all)
+    return operation
+
+for _count in 100, 1000:
+    scenario('update_draw_{}'.format(_count))(
+        lambda count=_count: _sprites(count))
+
+
+def _projectiles(count, entity_store):
+    from pygame import Rect
+    from render import Renderer
+    from starfield import StarField
+    from game_objects import EnemyFactory
+    from simulation import Simulation, Hit
+    simulation = Simulation(seed=1, entity_store=entity_store)
+    simulation.player.kill()
+    rng = random.Random(1)
+    renderer = Renderer(_surface(), StarField(0))
+    renderer.reset()
+
+    def operation():
+        # beams that left the screen are replaced to keep count stable
+        for i in range(count - simulation.count_enemy_beams()):
+            EnemyFactory.fire((rng.randrange(window.width),
+                               rng.randrange(window.height)))
+        simulation.enemy_beams.refresh()
+        simulation.enemy_beams_hitting(Hit(Rect(400, 200, 80, 60)))
+        simulation.all.update()
+        if entity_store:
+            simulation.projectiles.update()
+        renderer.draw(*simulation.drawables())
+    return operation
+
+for _count in 200, 2000:
+    for _store in False, True:
+        scenario('projectiles_{}_{}'.format(
+            'store' if _store else 'sprites', _count))(
+            lambda count=_count, store=_store: _projectiles(count, store))
+
+
+def _fire(count, scheduled):
+    """
+    Decides the shots of count enemies on HARD for one frame.
+
+    With scheduled the FireScheduler pops the due enemies, without it
+    every enemy rolls for its shot like before the scheduler. No beams
+    are created, so both measure the decision alone.
+    """
+    from game_objects import EnemyFactory, FireScheduler
+    simulation = _groups()
+    EnemyFactory.change_enemy_strategy('HARD')
+    rng = random.Random(1)
+    enemies = [EnemyFactory._Enemy('basic_enemy', (rng.randrange(
+        window.width), rng.randrange(window.height)), 1)
+        for i in range(count)]
+    period = FireScheduler.periods['HARD']
+    fire = EnemyFactory.fire
+    EnemyFactory.fire = lambda pos, direction=-1: None
+
+    def operation():
+        if scheduled:
+            EnemyFactory.scheduler.tick()
+        else:
+            for enemy in enemies:
+                if EnemyFactory.rng.randrange(0, period) == 0:
+                    enemy._fire()
+
+    def cleanup():
+        EnemyFactory.fire = fire
+        simulation.end()
+    operation.cleanup = cleanup
+    return operation
+
+for _count in 10, 100, 1000:
+    scenario('fire_scheduler_{}'.format(_count))(
+        lambda count=_count: _fire(count, True))
+    scenario('fire_roll_{}'.format(_count))(
+        lambda count=_count: _fire(count, False))
+
+
+@scenario('menu_redraw')
+def _menu():
+    from menu import Menu
+    surface = _surface()
+    menu = Menu(['Start', 'Change difficulty', 'Quit'], surface)
+
+    def operation():
+        menu.draw(1)
+    return operation
+
+
+def _preload(atlas):
+    from assets import ImageCache, data_dir
+    _surface()
+
+    def operation():
+        ImageCache(data_dir, atlas).preload()
+    return operation
+
+scenario('preload_files')(lambda: _preload(None))
+scenario('preload_atlas')(lambda: _preload('atlas.json'))
+
+
+@scenario('hud_text')
+def _hud():
+    from game_objects import Score
+    score = Score()
+    surface = _surface()
+
+    def operation():
+        score.value += 7
+        score.update()
+        surface.blit(score.image, score.rect)
+    return operation
+
+
+@scenario('highscore_load_save')
+def _highscore():
+    import shutil
+    import tempfile
+    from highscores import HighscoreStore
+    directory = tempfile.mkdtemp()
+    store = HighscoreStore(os.path.join(directory, 'highscores.json'))
+    rng = random.Random(1)
+
+    def operation():
+        store.submit(rng.randrange(100), 'bench', ['bench'])
+        store.scores('bench')
+
+    def cleanup():
+        store.close()
+        shutil.rmtree(directory)
+    operation.cleanup = cleanup
+    return operation
+
+
+@scenario('simulation_frame')
+def _simulation(enemies=12):
+    """
+    Whole game steps with a fixed population.
+
+    The player can't be destroyed and sweeps up and down while firing,
+    the enemies shot or gone are replaced right away and no bonuses
+    come. Neither the length of a game nor the waves decide the work,
+    so changes of the rules don't change the workload.
+    """
+    from game_objects import EnemyFactory, Indestructable
+    from simulation import Simulation, Inputs
+    simulation = Simulation('HARD', seed=1)
+    player = simulation.players[0] = Indestructable(simulation.player)
+    player.time_left = float('inf')
+    rng = random.Random(1)
+
+    def create_enemy():
+        for i in range(enemies - len(simulation.enemies)):
+            EnemyFactory._Enemy.create('basic_enemy', (
+                window.width, rng.choice(EnemyFactory.enemy_tracks)), 1)
+    simulation.create_enemy = create_enemy
+    simulation.create_bonus = lambda: None
+
+    def operation():
+        frame = simulation.frame
+        simulation.step(Inputs(0, 1 if frame // 60 % 2 else -1, frame % 2))
+    operation.cleanup = simulation.end
+    return operation
+
+
+def run(names, seconds, repeat=1):
+    """
+    Measures scenarios, the best of repeat runs of each.
+
+    A busy machine only ever slows a run down, so the fastest one is
+    the closest to what the code can do.
+    """
+    results = collections.OrderedDict()
+    for name in names:
+        operation = scenarios[name]()
+        try:
+            results[name] = max((measure(operation, seconds)
+                                 for i in range(repeat)),
+                                key=lambda stats: stats.ops_per_sec)
+        finally:
+            getattr(operation, 'cleanup', lambda: None)()
+        print('{:<24} {:>12.1f} ops/s  p50 {:>8.3f} ms  p99 {:>8.3f} ms'
+              .format(name, *results[name][:3]))
+    return results
+
+
+def machine():
+    """Description of this machine, stored with a baseline."""
+    return '{} {} Python {}'.format(platform.system(), platform.machine(),
+                                    platform.python_version())
+
+
+def compare(results, baseline, tolerance, relative=False):
+    """
+    Names of scenarios slower than baseline by more than tolerance.
+
+    With relative (for a baseline of another machine) speeds are taken
+    relative to the median speedup of all compared scenarios, so a
+    machine that is slower as a whole doesn't fail every scenario, only
+    ones that fell behind the rest do.
+    """
+    ratios = {name: stats.ops_per_sec / baseline[name]['ops_per_sec']
+              for name, stats in results.items() if name in baseline}
+    if not ratios:
+        return []
+    speed = 1.0
+    # too few scenarios to tell the machine from the code
+    if relative and len(ratios) >= 3:
+        speed = sorted(ratios.values())[len(ratios) // 2]
+    regressions = []
+    for name, ratio in ratios.items():
+        if ratio < speed * (1 - tolerance):
+            print('REGRESSION {}: {:.1f} ops/s, baseline {:.1f} ops/s, '
+                  '{:.0%} of the baseline, {:.0%} of the median speed'
+                  .format(name, results[name].ops_per_sec,
+                          baseline[name]['ops_per_sec'], ratio,
+                          ratio / speed))
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark hot paths.')
+    parser.add_argument('scenarios', nargs='*',
+                        help='scenarios to run, all by default')
+    parser.add_argument('-t', '--time', type=float, default=0.5,
+                        help='seconds per run of a scenario')
+    parser.add_argument('-r', '--repeat', type=int, default=3,
+                        help='runs per scenario, the fastest counts')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed slowdown against baseline')
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--save', action='store_true',
+                        help='store results as the new baseline')
+    parser.add_argument('--report', action='store_true',
+                        help="only report regressions, don't exit with 1")
+    args = parser.parse_args()
+    unknown = set(args.scenarios) - set(scenarios)
+    if unknown:
+        parser.error('unknown scenarios: {}, choose from: {}'.format(
+            ', '.join(sorted(unknown)), ', '.join(scenarios)))
+
+    os.chdir(main_dir)
+    pygame.display.init()
+    pygame.font.init()
+    _surface()
+    results = run(args.scenarios or list(scenarios), args.time, args.repeat)
+
+    if args.save:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        baseline.update((name, stats._asdict())
+                        for name, stats in results.items())
+        baseline['machine'] = machine()
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print('baseline saved to {}'.format(args.baseline))
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        relative = baseline.get('machine') != machine()
+        if relative:
+            print('baseline was recorded on {}, comparing to the median '
+                  'speed, save one on this machine for exact results'.format(
+                      baseline.get('machine', 'another machine')))
+        if compare(results, baseline, args.tolerance, relative) and \
+                not args.report:
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
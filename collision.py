@@ -0,0 +1,155 @@
+import pygame
+from settings import object_size
+
+
+class GridGroup(pygame.sprite.Group):
+    """
+    Sprite group that also keeps its sprites in a uniform grid.
+
+    Cells have the size of settings.object_size, so a sprite usually
+    takes one to four cells. Grid is brought up to date by refresh(),
+    which only moves sprites that changed cells. Call it after sprites
+    moved and before collisions are checked.
+    """
+    cell_width, cell_height = object_size
+
+    def __init__(self, *sprites):
+        self.cells = {}
+        self.spans = {}
+        self.order = {}
+        self.added = 0
+        super(GridGroup, self).__init__(*sprites)
+
+    def add_internal(self, sprite, layer=None):
+        super(GridGroup, self).add_internal(sprite)
+        # rect is often assigned after sprite joined its groups,
+        # so sprite gets its cells on the next refresh
+        self.spans[sprite] = None
+        self.order[sprite] = self.added
+        self.added += 1
+
+    def remove_internal(self, sprite):
+        super(GridGroup, self).remove_internal(sprite)
+        self._unlink(sprite, self.spans.pop(sprite))
+        del self.order[sprite]
+
+    def refresh(self):
+        """Moves sprites that changed cells since the last refresh."""
+        spans = self.spans
+        for sprite in self.spritedict:
+            span = self.span(sprite.rect)
+            old = spans[sprite]
+            if span != old:
+                self._unlink(sprite, old)
+                self._link(sprite, span)
+                spans[sprite] = span
+
+    def span(self, rect):
+        """Cells covered by rect as (left, top, right, bottom)."""
+        return (rect.left // self.cell_width,
+                rect.top // self.cell_height,
+                (rect.right - 1) // self.cell_width,
+                (rect.bottom - 1) // self.cell_height)
+
+    def candidates(self, rect):
+        """Sprites sharing a cell with rect, in the group's order."""
+        left, top, right, bottom = self.span(rect)
+        cells = self.cells
+        found = set()
+        for x in range(left, right + 1):
+            for y in range(top, bottom + 1):
+                cell = cells.get((x, y))
+                if cell:
+                    found.update(cell)
+        if len(found) > 1:
+            return sorted(found, key=self.order.__getitem__)
+        return list(found)
+
+    def _link(self, sprite, span):
+        left, top, right, bottom = span
+        cells = self.cells
+        for x in range(left, right + 1):
+            for y in range(top, bottom + 1):
+                cell = cells.get((x, y))
+                if cell is None:
+                    cell = cells[x, y] = set()
+                cell.add(sprite)
+
+    def _unlink(self, sprite, span):
+        if span is None:
+            return
+        left, top, right, bottom = span
+        cells = self.cells
+        for x in range(left, right + 1):
+            for y in range(top, bottom + 1):
+                cell = cells[x, y]
+                cell.discard(sprite)
+                if not cell:
+                    del cells[x, y]
+
+
+solid_masks = {}
+
+
+def solid_mask(size):
+    """Mask with every bit set, shared by rects of the same size."""
+    mask = solid_masks.get(size)
+    if mask is None:
+        mask = solid_masks[size] = pygame.Mask(size, fill=True)
+    return mask
+
+
+def collide_mask(left, right):
+    """
+    Whether visible pixels of two sprites with overlapping rects touch.
+
+    Sprites use their mask attribute (see assets.ImageCache.mask),
+    sprites without one are solid rectangles. Unlike
+    pygame.sprite.collide_mask it never builds masks from images, the
+    rect test is left to the caller.
+    """
+    left_mask = getattr(left, 'mask', None)
+    right_mask = getattr(right, 'mask', None)
+    if left_mask is None and right_mask is None:
+        return True
+    left_rect, right_rect = left.rect, right.rect
+    if left_mask is None:
+        left_mask = solid_mask(left_rect.size)
+    elif right_mask is None:
+        right_mask = solid_mask(right_rect.size)
+    offset = (right_rect.x - left_rect.x, right_rect.y - left_rect.y)
+    return left_mask.overlap(right_mask, offset) is not None
+
+
+def spritecollide(sprite, group, dokill, collided=None):
+    """
+    Same as pygame.sprite.spritecollide, but asks the grid for candidates.
+
+    Rects are compared first, collided (e.g. collide_mask) is only
+    called for sprites whose rects overlap. Groups other than GridGroup
+    are tested against every sprite.
+    """
+    if not isinstance(group, GridGroup):
+        crashed = [i for i in pygame.sprite.spritecollide(sprite, group, 0)
+                   if collided is None or collided(sprite, i)]
+    else:
+        rect = sprite.rect
+        crashed = [i for i in group.candidates(rect)
+                   if rect.colliderect(i.rect)
+                   and (collided is None or collided(sprite, i))]
+    if dokill:
+        for i in crashed:
+            i.kill()
+    return crashed
+
+
+def groupcollide(groupa, groupb, dokilla, dokillb, collided=None):
+    """Same as pygame.sprite.groupcollide, uses grid of groupb."""
+    crashed = {}
+    for sprite in groupa.sprites():
+        hit = spritecollide(sprite, groupb, dokillb, collided)
+        if hit:
+            crashed[sprite] = hit
+            if dokilla:
+                sprite.kill()
+    return crashed
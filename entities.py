@@ -0,0 +1,125 @@
+import numpy
+import pygame
+from pygame.locals import *
+from settings import window
+
+
+class EntityStore:
+    """
+    Many simple entities kept as a structure of NumPy arrays.
+
+    Every entity has a kind (with a shared image), position, horizontal
+    speed and whether it's alive. update() moves all of them and drops
+    the ones that left the screen or were killed in one vectorized step,
+    collisions are tested against all entities at once and drawing goes
+    through a single Surface.blits call. clear() and draw() work like
+    RenderUpdates, so a store can be rendered together with sprite
+    groups. Only beams are kept here, they die at the first hit.
+    serial numbers entities in the order they were spawned.
+    """
+    fields = ('x', 'y', 'w', 'h', 'vx', 'kind', 'alive', 'serial')
+
+    def __init__(self, capacity=256):
+        for name in self.fields:
+            dtype = bool if name == 'alive' else numpy.int32
+            setattr(self, name, numpy.zeros(capacity, dtype=dtype))
+        self.count = 0
+        self.spawned = 0
+        self.images = []
+        self.drawn = []
+        self.lost = []
+
+    def __len__(self):
+        return self.count
+
+    def add_kind(self, image):
+        """Registers image of a new kind and returns the kind's number."""
+        self.images.append(image)
+        return len(self.images) - 1
+
+    def spawn(self, kind, rect, vx):
+        """Adds an entity of kind placed at rect."""
+        if self.count == len(self.x):
+            self._grow()
+        i = self.count
+        self.x[i], self.y[i], self.w[i], self.h[i] = rect
+        self.vx[i] = vx
+        self.alive[i] = True
+        self.kind[i] = kind
+        self.serial[i] = self.spawned
+        self.spawned += 1
+        self.count += 1
+        return i
+
+    def count_kind(self, kind):
+        """Number of living entities of kind."""
+        n = self.count
+        return int(numpy.count_nonzero((self.kind[:n] == kind) &
+                                       self.alive[:n]))
+
+    def update(self):
+        """Moves entities and removes those that left the screen."""
+        n = self.count
+        x = self.x[:n]
+        x += self.vx[:n]
+        self._keep((x < window.width) & (x + self.w[:n] > 0) &
+                   self.alive[:n])
+
+    def collide(self, rect, kind=None):
+        """Indices of entities (of kind) overlapping rect."""
+        n = self.count
+        x, y = self.x[:n], self.y[:n]
+        hit = (x < rect.right) & (x + self.w[:n] > rect.left) & \
+              (y < rect.bottom) & (y + self.h[:n] > rect.top) & \
+              self.alive[:n]
+        if kind is not None:
+            hit &= self.kind[:n] == kind
+        return numpy.flatnonzero(hit)
+
+    def rect(self, i):
+        return Rect(int(self.x[i]), int(self.y[i]),
+                    int(self.w[i]), int(self.h[i]))
+
+    def kill(self, indices):
+        """Removes entities at indices (for good on the next update)."""
+        self.alive[indices] = False
+
+    def empty(self):
+        self.count = 0
+        self.lost.extend(self.drawn)
+        self.drawn = []
+
+    def clear(self, surface, bgd):
+        for rect in self.lost:
+            surface.blit(bgd, rect, rect)
+        for rect in self.drawn:
+            surface.blit(bgd, rect, rect)
+
+    def draw(self, surface):
+        """Blits living entities and returns changed areas."""
+        n = self.count
+        alive = numpy.flatnonzero(self.alive[:n])
+        images = self.images
+        sequence = [(images[kind], (x, y)) for kind, x, y in zip(
+            self.kind[alive].tolist(), self.x[alive].tolist(),
+            self.y[alive].tolist())]
+        drawn = surface.blits(sequence) if sequence else []
+        dirty = self.lost + self.drawn + drawn
+        self.lost = []
+        self.drawn = drawn
+        return dirty
+
+    def _keep(self, mask):
+        kept = int(numpy.count_nonzero(mask))
+        if kept == self.count:
+            return
+        for name in self.fields:
+            array = getattr(self, name)
+            array[:kept] = array[:self.count][mask]
+        self.count = kept
+
+    def _grow(self):
+        for name in self.fields:
+            array = getattr(self, name)
+            setattr(self, name, numpy.concatenate([array,
+                                                   numpy.zeros_like(array)]))
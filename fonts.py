@@ -0,0 +1,134 @@
+import string
+import pygame
+
+fonts = {}
+atlases = {}
+
+
+def get_font(size, path=None):
+    """Font from the file at path (system monospace without path), cached."""
+    key = (path, size)
+    font = fonts.get(key)
+    if font is None:
+        if not pygame.font.get_init():
+            pygame.font.init()
+        if path is None:
+            font = pygame.font.SysFont("monospace", size)
+        else:
+            font = pygame.font.Font(path, size)
+        fonts[key] = font
+    return font
+
+
+def get_atlas(size, path=None, color=(255, 255, 0)):
+    """GlyphAtlas of a font in color, shared by all texts that use it."""
+    key = (path, size, tuple(color))
+    atlas = atlases.get(key)
+    if atlas is None:
+        atlas = atlases[key] = GlyphAtlas(get_font(size, path), color)
+    return atlas
+
+
+class GlyphAtlas:
+    """
+    Texts of one font and color rendered once and reused as glyphs.
+
+    Digits are rendered up front, any other character the first time it
+    is drawn, so changing numbers never go through FreeType again.
+    Registered texts, like labels, are kept as one glyph to keep their
+    original kerning. A TextBuffer lays glyphs side by side.
+    """
+    preload = string.digits
+
+    def __init__(self, font, color):
+        self.font = font
+        self.color = color
+        self.colorkey = tuple(255 - i for i in color[:3])
+        self.glyphs = {}
+        self.widths = {}
+        for character in self.preload:
+            self.glyph(character)
+        self.height = max(i.get_height() for i in self.glyphs.values())
+
+    def glyph(self, text):
+        """Rendered text, it's kept as one glyph from now on."""
+        image = self.glyphs.get(text)
+        if image is None:
+            image = self.font.render(text, 0, self.color)
+            if pygame.display.get_surface():
+                # same format as the buffers, blits don't convert pixels
+                glyph = pygame.Surface(image.get_size()).convert()
+                glyph.fill(self.colorkey)
+                glyph.blit(image, (0, 0))
+                glyph.set_colorkey(self.colorkey)
+                image = glyph
+            self.glyphs[text] = image
+            self.widths[image] = image.get_width()
+        return image
+
+    def size(self, texts):
+        widths = self.widths
+        return (sum(widths[i] for i in self.glyphs_of(texts)), self.height)
+
+    def glyphs_of(self, texts):
+        """Glyphs that draw texts, unknown texts are split into characters."""
+        get = self.glyphs.get
+        glyphs = []
+        for text in texts:
+            image = get(text)
+            if image is not None:
+                glyphs.append(image)
+            else:
+                glyphs.extend([get(i) or self.glyph(i) for i in text])
+        return glyphs
+
+
+class TextBuffer:
+    """
+    Surface that texts of an atlas are composed into.
+
+    Glyphs equal to the ones drawn last time are left in place, so when
+    a score goes from 1299 to 1300 only the last three digits are
+    blitted. image is a subsurface of the buffer as wide as the text.
+    """
+
+    def __init__(self, atlas):
+        self.atlas = atlas
+        self.surface = None
+        self.glyphs = []
+        self.image = None
+
+    def compose(self, texts):
+        atlas = self.atlas
+        widths = atlas.widths
+        glyphs = atlas.glyphs_of(texts)
+        drawn = self.glyphs
+        # glyphs that are already there are skipped
+        sequence = []
+        x = 0
+        start = None
+        for i, image in enumerate(glyphs):
+            if start is None and (i >= len(drawn) or drawn[i] is not image):
+                start = x
+            if start is not None:
+                sequence.append((image, (x, 0)))
+            x += widths[image]
+        width = max(x, 1)
+        surface = self.surface
+        if surface is None or surface.get_width() < width:
+            size = (max(width, 2 * surface.get_width() if surface else 0),
+                    atlas.height)
+            surface = self.surface = pygame.Surface(size)
+            if pygame.display.get_surface():
+                surface = self.surface = surface.convert()
+            surface.set_colorkey(atlas.colorkey)
+            self.glyphs = []
+            self.image = None
+            return self.compose(texts)
+        if sequence:
+            surface.fill(atlas.colorkey, (start, 0, x - start, atlas.height))
+            surface.blits(sequence, doreturn=0)
+        if self.image is None or self.image.get_width() != width:
+            self.image = surface.subsurface((0, 0, width, atlas.height))
+        self.glyphs = glyphs
+        return self.image
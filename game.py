@@ -1,101 +1,157 @@
 import sys
+import time
+import threading
+started = time.perf_counter()
+
 import pygame
 import random
 from pygame.locals import *
 from game_objects import *
 from starfield import *
 from menu import *
+from assets import images
+from render import Renderer
+from simulation import Simulation, Inputs, FPS
+from timestep import FixedTimestep, Interpolator
+from pipeline import Pipeline, FrameLayer
+from net import Client
+from replay import Recorder
+from profiler import FrameProfiler, ProfilerOverlay, StartupTimer
 from settings import *
 from settings import window
 
-pygame.display.init()
-random.seed()
-
-SCORE = 0
 DIFFICULTY = 'EASY'
-LEVEL = 1
-ENEMY_APPEAR_CHANCE = 20
-ENEMY_SHOT_CHANCE = 20
 
 class Game():
     """It's a facade for all game modules."""
     menu_options = ['Start', 'Change difficulty', 'Quit']
-    score = Score()
-    difficulty = Difficulty()
-    stars = initialize_stars()
+    score = None
+    level = None
+    difficulty = None
+    stars = None
     last_score = None
+    menu = None
+    warming = None
+
+    @classmethod
+    def init(cls, timer):
+        """Creates the texts and stars, nothing is built at import."""
+        cls.score = Score()
+        cls.level = Level()
+        cls.difficulty = Difficulty()
+        timer.mark('hud')
+        cls.stars = StarField()
+        timer.mark('stars')
+
+    @staticmethod
+    def warm_caches(timer):
+        """Decodes all images and pulse frames before the first game."""
+        images.preload()
+        BonusFactory.preload()
+        for name in EnemyFactory.enemies:
+            images.mask(name + '.gif')
+        images.mask('normal_beam.gif')
+        timer.mark('assets')
+        if STARTUP_TIMING:
+            print(timer.report())
 
     @classmethod
-    def draw_game_background(cls, dest_surface):
-        dest_surface.fill(SKY_COLOR)
-        draw_stars(dest_surface, cls.stars, SKY_COLOR)
-        move_stars(cls.stars)
-        draw_stars(dest_surface, cls.stars, STAR_COLOR)
+    def start_warming(cls, timer, background=True):
+        """
+        Warms caches on a thread while the menu is shown, or right away.
+
+        wait_for_caches() lets the thread finish before a game starts,
+        so no game loads images from disk.
+        """
+        if not background:
+            cls.warm_caches(timer)
+            return
+        cls.warming = threading.Thread(target=cls.warm_caches, args=(timer,),
+                                       name='caches', daemon=True)
+        cls.warming.start()
+
+    @classmethod
+    def wait_for_caches(cls):
+        if cls.warming is not None:
+            cls.warming.join()
+            cls.warming = None
 
     @classmethod
     def get_menu(cls, dest_surface):
+        """Shows menu, it's rendered only the first time."""
         dest_surface.fill((51,51,51))
-        menu = Menu(cls.menu_options, dest_surface)
-        menu.draw()
+        if cls.menu is None:
+            cls.menu = Menu(cls.menu_options, dest_surface)
+        cls.menu.select_position = 0
+        cls.menu.draw()
         display_highscore(HIGHSCORE, dest_surface)
-        return menu
+        pygame.display.update()
+        return cls.menu
 
     @classmethod
     def change_difficulty(cls, dest_surface):
         pygame.draw.rect(dest_surface, (51, 51, 51), [10, 450, 200, 30])
         DIFFICULTY = next(difficulty_gen)
-        cls.difficulty.difficulty = DIFFICULTY
+        cls.difficulty.value = DIFFICULTY
         EnemyFactory.change_enemy_strategy(DIFFICULTY)
 
     @classmethod
-    def update_score(cls):
-        cls.score.score = SCORE
-
-    @classmethod
-    def create_enemy(cls, objects):
-        if random.randrange(0, ENEMY_APPEAR_CHANCE) == 0:
-            EnemyFactory.create_enemy(LEVEL, objects)
+    def update_score(cls, score):
+        cls.score.value = score
 
     @classmethod
-    def create_bonus(cls):
-        BonusFactory.create_bonus()
+    def update_level(cls, level):
+        cls.level.value = level
 
 
 
 if __name__ == '__main__':
+    timer = StartupTimer(started)
+    timer.mark('imports')
+    random.seed()
+
     # initialize surface
-    surface = pygame.display.set_mode(window)
+    pygame.display.init()
+    if VSYNC:
+        surface = pygame.display.set_mode(window, SCALED, vsync=1)
+    else:
+        surface = pygame.display.set_mode(window)
+    timer.mark('display')
+    Game.init(timer)
+    renderer = Renderer(surface, Game.stars)
 
-    # initialize clock
+    # initialize clock, simulation runs FPS ticks a second whatever
+    # the frame rate is
     clock = pygame.time.Clock()
+    timestep = FixedTimestep(FPS, MAX_TICKS_PER_FRAME)
+    interpolator = Interpolator()
+    elapsed = 0.0
+
+    # with PIPELINE the simulation runs on its own thread, with SERVER
+    # on a server (see net.py), the game draws the frames they publish
+    layer = FrameLayer()
+    remote = PIPELINE or SERVER
+
+    # text shown over the game
+    hud = pygame.sprite.RenderUpdates()
 
-    # initialize game groups
-    all = pygame.sprite.RenderUpdates()
-    enemy_beams = pygame.sprite.Group()
-    player_beams = pygame.sprite.Group()
-    enemies = pygame.sprite.Group()
-    bonuses = pygame.sprite.Group()
-
-    # assign default groups to each sprite class
-    EnemyFactory._Enemy.containers = all, enemies
-    BonusFactory._Bonus.containers = all, bonuses
-    PlayerBeam.containers = all, player_beams
-    EnemyBeam.containers = all, enemy_beams
-    Player.containers = all
-    Explosion.containers = all
-    TextObject.containers = all
-
-    #load image explosion
-    img = load_image('explosion.gif')[0]
-    Explosion.images = [img, pygame.transform.flip(img, 1, 1)]
+    # measure phases of every frame
+    if PROFILE:
+        profiler = FrameProfiler()
+        renderer.profiler = profiler
+        overlay = ProfilerOverlay(profiler)
 
     # init menu
     menu = Game.get_menu(surface)
-    all.add(Game.difficulty)
+    hud.add(Game.difficulty)
     in_menu = True
+    timer.mark('first frame')
+
+    # images are decoded while the menu waits for the player, or
+    # before it takes input without WARM_CACHES_IN_BACKGROUND
+    Game.start_warming(timer, background=WARM_CACHES_IN_BACKGROUND)
 
     while True:
-        # Game.draw_game_background(surface)
         if in_menu:
             for event in pygame.event.get():
                 if event.type == KEYDOWN:
@@ -105,12 +161,30 @@ if __name__ == '__main__':
                         menu.draw(1)
                     if event.key == K_RETURN:
                         if menu.get_position() == 0:
+                            Game.wait_for_caches()
                             in_menu = False
                             Game.difficulty.kill()
-                            all.add(Game.score)
-                            start_ticks = pygame.time.get_ticks()
-                            player = Player()
-                            last_second = 0
+                            hud.add(Game.score, Game.level)
+                            timestep.reset()
+                            renderer.reset()
+                            if SERVER:
+                                pipeline = Client(SERVER)
+                                pipeline.start()
+                                state = pipeline.mirror.state
+                            else:
+                                simulation = Simulation(
+                                    Game.difficulty.value,
+                                    entity_store=ENTITY_STORE)
+                                recorder = Recorder(simulation)
+                                state = simulation.state()
+                            if PROFILE:
+                                if not remote:
+                                    simulation.profiler = profiler
+                                hud.add(overlay)
+                            if PIPELINE and not SERVER:
+                                pipeline = Pipeline(simulation, recorder.step,
+                                                    FPS, MAX_TICKS_PER_FRAME)
+                                pipeline.start()
                         if menu.get_position() == 1:
                             Game.change_difficulty(surface)
                         if menu.get_position() == 2:
@@ -119,87 +193,75 @@ if __name__ == '__main__':
                     if event.key == K_ESCAPE:
                         pygame.display.quit()
                         sys.exit()
-                    menu.draw()
-                    pygame.display.update()
+                    if in_menu:
+                        pygame.display.update(menu.dirty)
                 elif event.type == QUIT:
                     pygame.display.quit()
                     sys.exit()
         else:
-            # calculate how many seconds passed
-            seconds = int((pygame.time.get_ticks()-start_ticks) / 1000)
-            # every x seconds level goes up
-            if seconds % 5 == 0 and seconds != last_second:
-                last_second = seconds
-                LEVEL += 1
-
-            Game.draw_game_background(surface)
-            Game.create_enemy(all)
-            Game.create_bonus()
-
+            renderer.profiler.begin_frame()
             # handle player
             keystate = pygame.key.get_pressed()
-            left_right = keystate[K_RIGHT] - keystate[K_LEFT]
-            up_down = keystate[K_DOWN] - keystate[K_UP]
-            firing = keystate[K_SPACE]
-            if not player.reloading and firing and \
-               player.beam_limit > len(player_beams):
-                PlayerBeam(player.beam_pos())
-            player.reloading = firing
-            player = player.move(left_right, up_down)
-
-            # handle enemies
-            for i in enemies:
-                i.shot()
-
-            # handle collisions
-            for alien in pygame.sprite.spritecollide(player, enemies, 1):
-                Explosion(alien)
-                if not isinstance(player, Indestructable):
-                    Explosion(player)
-                    save_score('highscore', SCORE)
-                    for i in all:
-                        i.kill()
-                    all.add(Game.difficulty)
-                    SCORE = 0
-                    in_menu = True
-                    pygame.time.wait(3000)
-                    menu = Game.get_menu(surface)
-                player.destroy()
-                SCORE += alien.score
-
-            for alien in pygame.sprite.groupcollide(
-              enemies, player_beams, 0, 1).keys():
-                if alien.health - player.beam_power <= 0:
-                    alien.kill()
-                    Explosion(alien)
-                    SCORE += alien.score
-                alien.health -= player.beam_power
-
-            for enemy_beam in pygame.sprite.spritecollide(
-              player, enemy_beams, 1):
-                Explosion(enemy_beam)
-                if not isinstance(player, Indestructable):
-                    Explosion(player)
-                    save_score('highscore', SCORE)
-                    for i in all:
-                        i.kill()
-                    all.add(Game.difficulty)
-                    SCORE = 0
-                    in_menu = True
-                    pygame.time.wait(3000)
-                    menu = Game.get_menu(surface)
-                player.destroy()
-
-            for bonus in pygame.sprite.spritecollide(player, bonuses, 1):
-                player = bonus.upgrade(player)
-                SCORE += 1
-
-            Game.update_score()
-
-
-        all.update()
-        dirty = all.draw(surface)
-        pygame.display.update(dirty)
-        pygame.display.flip()
+            inputs = Inputs(left_right=keystate[K_RIGHT] - keystate[K_LEFT],
+                            up_down=keystate[K_DOWN] - keystate[K_UP],
+                            firing=keystate[K_SPACE])
+            renderer.profiler.mark('events')
+            if remote:
+                pipeline.send(inputs)
+                frame = pipeline.latest()
+                if pipeline.error:
+                    raise pipeline.error
+                if frame is not None:
+                    layer.frame = frame
+                    state = frame.state
+            else:
+                ticks = timestep.advance(elapsed)
+                for i in range(ticks):
+                    if INTERPOLATE and i == ticks - 1:
+                        interpolator.capture(simulation.all,
+                                             simulation.projectiles)
+                    state = recorder.step(inputs)
+                    if state.game_over:
+                        break
+            Game.update_score(state.score)
+            Game.update_level(state.level)
+
+            if state.game_over:
+                save_score(HIGHSCORE, state.score, PLAYER_NAME,
+                           Game.difficulty.value)
+                if REPLAY_FILE and not SERVER:
+                    recorder.save(REPLAY_FILE)
+                if PROFILE and PROFILE_TRACE:
+                    profiler.export(PROFILE_TRACE)
+                if remote:
+                    pipeline.stop()
+                    layer.empty()
+                if not SERVER:
+                    simulation.end()
+                Game.score.kill()
+                Game.level.kill()
+                if PROFILE:
+                    overlay.kill()
+                hud.add(Game.difficulty)
+                in_menu = True
+                pygame.time.wait(3000)
+                menu = Game.get_menu(surface)
+
+        hud.update()
+        renderer.profiler.mark('hud')
+        if in_menu:
+            pygame.display.update(hud.draw(surface))
+        elif remote:
+            renderer.draw(layer, hud, steps=elapsed * FPS)
+            if layer.frame is not None:
+                renderer.profiler.end_frame(layer.frame.counts)
+        else:
+            store = simulation.projectiles
+            if INTERPOLATE:
+                interpolator.apply(simulation.all, timestep.alpha(), store)
+            renderer.draw(*simulation.drawables(), hud, steps=elapsed * FPS)
+            if INTERPOLATE:
+                interpolator.restore(store)
+            renderer.profiler.end_frame(simulation.counts())
         pygame.event.pump()
-        clock.tick(60)
+        elapsed = clock.tick(TARGET_FPS) / 1000.0
@@ -1,73 +1,65 @@
-import os
+import heapq
 import random
-import types
 import pygame
-from collections import namedtuple
 from settings import window
 from settings import object_size
 from pygame.locals import *
+from assets import images
+from pool import Pooled, SpritePool
+from rng import geometric_delay
+from starfield import SKY_COLOR
+from fonts import get_font, get_atlas, TextBuffer
 
 SCORE = 0
 DIFFICULTY = 'EASY'
 
-main_dir = os.path.split(os.path.abspath(__file__))[0]
-data_dir = os.path.join(main_dir, 'data')
 screenrect = Rect(0, 0, window.width, window.height)
 
-def load_image(name):
-    """load_image(name) -> (surface, rect)"""
-    image_path = os.path.join(data_dir, name)
-    try:
-        image = pygame.image.load(image_path)
-    except pygame.error:
-        print('Cannot load image, path: {}'.format(image_path))
-        raise SystemExit(str(geterror()))
-    image = image.convert()
+def load_image(name, copy=False):
+    """
+    load_image(name, copy=False) -> (surface, rect)
+
+    Surface is shared between all sprites using the image, pass copy
+    when sprite changes its own image (e.g. alpha).
+    """
+    image = images.get(name)
+    if copy:
+        image = image.copy()
     return image, image.get_rect()
 
-def difficulty_generator():
+def difficulty_generator(current='EASY'):
     """
-    Generator that produces difficulties.
+    Generator that produces difficulties following current one.
 
     warning: only use with next or functools (infinite loop)
     """
     difficulties = ['EASY', 'MEDIUM', 'HARD']
-    index = 0
+    index = difficulties.index(current) + 1
     while True:
         yield difficulties[index%3]
         index += 1
 
 
-class SingletonMetaClass(type):
-    """Metaclass that restricts object creation to only one instance."""
-    def __init__(cls, name, bases, dict):
-        super(SingletonMetaClass, cls).__init__(name, bases, dict)
-        original_new = cls.__new__
-        def my_new(cls, *args, **kwargs):
-            if cls.instance == None:
-                cls.instance = original_new(cls, *args, **kwargs)
-            return cls.instance
-        cls.instance = None
-        cls.__new__ = staticmethod(my_new)
-
-
-class Player(pygame.sprite.Sprite, metaclass=SingletonMetaClass):
+class Player(pygame.sprite.Sprite):
     speed = 6
     gun_offset = 20
     beam_limit = 3
     beam_speed = 8
     beam_power = 1
+    image_name = 'player.gif'
+    kind = 'player'
 
-    def __init__(self):
+    def __init__(self, position=(0, 0)):
         pygame.sprite.Sprite.__init__(self, self.containers)
-        self.image, self.rect = load_image('player.gif')
-        self.rect.topleft = 0, 0
+        self.image, self.rect = load_image(self.image_name)
+        self.mask = images.mask(self.image_name)
+        self.rect.topleft = position
         self.reloading = 0
 
     def move(self, left_right, up_down):
         """Moves player depending on which arrowkeys were pressed."""
         self.rect.move_ip(left_right*self.speed, up_down*self.speed)
-        self.rect = self.rect.clamp(screenrect)
+        self.rect.clamp_ip(screenrect)
         return self
 
     def beam_pos(self):
@@ -102,9 +94,11 @@ class Indestructable:
         if self.alpha == 255 or self.alpha == 63:
             self.time_left -= 1
             self.change = -self.change
-        self.decorated.image.set_alpha(self.alpha)
+        frames = images.pulse(self.decorated.image_name, SKY_COLOR)
+        self.decorated.image = frames[(self.alpha - 63) // 4]
         self.decorated.move(left_right, up_down)
         if self.time_left == 0:
+            self.decorated.image = images.get(self.decorated.image_name)
             return self.decorated
         return self
 
@@ -159,18 +153,29 @@ class Indestructable:
     def image(self):
         return self.decorated.image
 
+    @property
+    def image_name(self):
+        return self.decorated.image_name
+
+    @property
+    def mask(self):
+        return self.decorated.mask
+
     @image.setter
-    def imgae(self, value):
+    def image(self, value):
         self.decorated.image = value
 
 
 
-class Beam(pygame.sprite.Sprite):
+class Beam(Pooled, pygame.sprite.Sprite):
     """Object that is shot by player and enemies."""
-    def __init__(self, pos, direction=1, speed=8):
-        pygame.sprite.Sprite.__init__(self, self.containers)
-        self.image = load_image('normal_beam.gif')[0]
-        self.rect = self.image.get_rect(midright=pos)
+    kind = 'beam'
+
+    def reset(self, pos, direction=1, speed=8):
+        self.image = images.get('normal_beam.gif')
+        self.mask = images.mask('normal_beam.gif')
+        self.rect.size = self.image.get_size()
+        self.rect.midright = pos
         self.speed = speed * direction
 
     def update(self):
@@ -182,15 +187,18 @@ class Beam(pygame.sprite.Sprite):
             self.kill()
 
 
-class Explosion(pygame.sprite.Sprite):
+class Explosion(Pooled, pygame.sprite.Sprite):
     """Object that is shown when player or enemy is destroyed."""
     defaultlife = 12
     animcycle = 3
     images = []
-    def __init__(self, actor):
-        pygame.sprite.Sprite.__init__(self, self.containers)
+    kind = 'explosion'
+    pool = SpritePool('Explosion', 32)
+
+    def reset(self, actor):
         self.image = self.images[0]
-        self.rect = self.image.get_rect(center=actor.rect.center)
+        self.rect.size = self.image.get_size()
+        self.rect.center = actor.rect.center
         self.life = self.defaultlife
 
     def update(self):
@@ -200,95 +208,155 @@ class Explosion(pygame.sprite.Sprite):
 
 
 class PlayerBeam(Beam):
-    pass
+    pool = SpritePool('PlayerBeam', 64)
+    owner = 0
+
+    def reset(self, pos, owner=0):
+        """owner -- index of the player who fired the beam"""
+        super(PlayerBeam, self).reset(pos)
+        self.owner = owner
 
 class EnemyBeam(Beam):
-    pass
+    pool = SpritePool('EnemyBeam', 128)
+
+
+class FireScheduler:
+    """
+    Decides which enemies shoot in which frame.
+
+    An enemy shoots in every frame with chance 1 / period, so frames to
+    its next shot follow a geometric distribution. The delay is sampled
+    once per shot and enemies wait in a heap ordered by the frame they
+    shoot in, so a frame only touches enemies that shoot. Entries of
+    killed enemies, or enemies reused from a pool since, are recognized
+    by their token and dropped when they come up.
+    """
+    periods = {'EASY': 200, 'MEDIUM': 150, 'HARD': 100}
+
+    def __init__(self, period=200):
+        self.period = period
+        self.heap = []
+        self.frame = 0
+        self.count = 0
+
+    def clear(self):
+        self.heap = []
+        self.frame = 0
+
+    def schedule(self, enemy, first=True):
+        """
+        Plans next shot of enemy.
+
+        A new enemy may shoot in the current frame, after a shot the
+        next one comes in the following frames at the earliest.
+        """
+        due = self.frame + geometric_delay(EnemyFactory.rng, self.period)
+        if first:
+            enemy.fire_token = self.count = self.count + 1
+            due -= 1
+        heapq.heappush(self.heap, (due, enemy.fire_token, enemy))
+
+    def tick(self):
+        """Fires enemies that are due in this frame."""
+        heap = self.heap
+        frame = self.frame
+        while heap and heap[0][0] <= frame:
+            due, token, enemy = heapq.heappop(heap)
+            if token == enemy.fire_token and enemy.alive():
+                enemy._fire()
+                self.schedule(enemy, first=False)
+        self.frame += 1
 
 
 class EnemyFactory:
     """Factory that produces enemies based on random chance and level."""
-    generator = []
     enemy_tracks = [i for i in range(0, window.height, object_size.height)]
     enemies = ['basic_enemy', 'mid_enemy', 'bulky_enemy']
-    last_level = 0
-
-    class _Enemy(pygame.sprite.Sprite):
+    rng = random
+    # creates enemy beams, replaced when beams are kept in an EntityStore
+    fire = EnemyBeam.create
+    # track -> number of enemies that still cover the spawn area
+    occupied_tracks = dict.fromkeys(enemy_tracks, 0)
+    scheduler = FireScheduler()
+
+    class _Enemy(Pooled, pygame.sprite.Sprite):
         speed = -1
         health = 1
         score = 1
         gun_offset = -20
-
-        def __init__(self, enemy_type, position,
-                     multiplier):
-            pygame.sprite.Sprite.__init__(self, self.containers)
-            self.image, self.rect = load_image(enemy_type + '.gif')
+        pool = SpritePool('Enemy', 64)
+
+        def reset(self, enemy_type, position, multiplier):
+            cls = type(self)
+            self.kind = enemy_type
+            self.image = images.get(enemy_type + '.gif')
+            self.mask = images.mask(enemy_type + '.gif')
+            self.rect.size = self.image.get_size()
             self.rect.topleft = position
-            self.speed *= multiplier
-            self.health *= multiplier
-            self.score *= multiplier
+            self.speed = cls.speed * multiplier
+            self.health = cls.health * multiplier
+            self.score = cls.score * multiplier
+            self.track = None
+            if self.rect.top in EnemyFactory.occupied_tracks:
+                self.track = self.rect.top
+                EnemyFactory.occupied_tracks[self.track] += 1
+            EnemyFactory.scheduler.schedule(self)
 
         def update(self):
             """Changes position of the enemy."""
             self.rect.move_ip(self.speed, 0)
+            if self.track is not None and \
+               self.rect.right <= window.width:
+                self._leave_track()
             if self.rect.right <= 0 or self.health <= 0:
                 self.kill()
 
+        def kill(self):
+            self._leave_track()
+            Pooled.kill(self)
+
+        def remove_internal(self, group):
+            # Group.remove and Group.empty don't go through kill
+            self._leave_track()
+            pygame.sprite.Sprite.remove_internal(self, group)
+
+        def _leave_track(self):
+            """Frees spawn area of enemy's track."""
+            if self.track is not None:
+                EnemyFactory.occupied_tracks[self.track] -= 1
+                self.track = None
+
         def _beam_pos(self):
             """Gets beam starting position."""
             return (self.rect.left + self.gun_offset, self.rect.centery)
 
-        def shot(self):
-            pass
+        def _fire(self):
+            EnemyFactory.fire(self._beam_pos(), direction=-1)
 
     @classmethod
-    def create_enemy(cls, level, objects):
-        if cls.last_level != level:
-            cls.last_level = level
-            if level < 4:
-                cls.generator.append(0)
-            elif level < 8:
-                cls.generator.append(1)
-            else:
-                cls.generator.append(2)
-        enemy_choice = random.choice(cls.generator)
-        rects = [i.rect.top for i in objects]
-        pos = random.choice(cls.enemy_tracks)
-        if pos in rects:
-            return
-        chance_for_enemy = random.randrange(0, 10)
-        if chance_for_enemy <= level - 1:
-            return cls._Enemy(cls.enemies[enemy_choice],
-                              (window.width, pos),
-                               multiplier=enemy_choice + 1)
+    def reset(cls):
+        """Forgets tracks and shots of the previous game."""
+        cls.occupied_tracks = dict.fromkeys(cls.enemy_tracks, 0)
+        cls.scheduler.clear()
 
     @classmethod
-    def change_enemy_strategy(cls, game_mode):
-        if game_mode == 'EASY':
-            cls._Enemy.shot = cls._easy_strategy
-        elif game_mode == 'NORMAL':
-            cls._Enemy.shot = cls._normal_strategy
-        elif game_mode == 'HARD':
-            cls._Enemy.shot = cls._hard_strategy
-
-
-    def _easy_strategy(self):
-        if random.randrange(0, 200) == 0:
-            EnemyBeam(self._beam_pos(), direction=-1)
-
-    def _normal_strategy(self):
-        if random.randrange(0, 150) == 0:
-            EnemyBeam(self._beam_pos(), direction=-1)
-
-    def _hard_strategy(self):
-        if random.randrange(0, 100) == 0:
-            EnemyBeam(self._beam_pos(), direction=-1)
+    def spawn(cls, enemy_type, track, multiplier):
+        """Enemy entering on track, None when the track is occupied."""
+        if cls.occupied_tracks[track]:
+            return None
+        return cls._Enemy.create(enemy_type, (window.width, track),
+                                 multiplier=multiplier)
 
+    @classmethod
+    def change_enemy_strategy(cls, game_mode):
+        """Sets how often enemies shoot in game_mode (a difficulty)."""
+        cls.scheduler.period = FireScheduler.periods[game_mode]
 
 
 class BonusFactory:
     bonuses = []
     window_margin = 60
+    rng = random
 
     class _Bonus(pygame.sprite.Sprite):
         """Base class for bonuses only to be subclassed."""
@@ -306,15 +374,25 @@ class BonusFactory:
                 self.change = -self.change
             if self.pickup_time == 0:
                 self.kill()
-            self.image.set_alpha(self.alpha)
+            self.image = self.frames[(self.alpha - 63) // 4]
+
+        def set_image(self, name):
+            """Uses pulse frames of the image shared by all bonuses."""
+            self.frames = images.pulse(name, SKY_COLOR)
+            self.image = self.frames[0]
+            self.mask = images.mask(name)
+            self.rect = self.image.get_rect()
 
         def set_position(self, position):
             self.rect.topleft = position
 
     class _BonusBeamLimit(_Bonus):
+        image_name = 'beamlimit.gif'
+        kind = 'beamlimit'
+
         def __init__(self, position):
             super(BonusFactory._BonusBeamLimit, self).__init__()
-            self.image, self.rect = load_image('beamlimit.gif')
+            self.set_image(self.image_name)
             self.set_position(position)
 
         def upgrade(self, player):
@@ -322,9 +400,12 @@ class BonusFactory:
             return player
 
     class _BonusBeamSpeed(_Bonus):
+        image_name = 'beamspeed.gif'
+        kind = 'beamspeed'
+
         def __init__(self, position):
             super(BonusFactory._BonusBeamSpeed, self).__init__()
-            self.image, self.rect = load_image('beamspeed.gif')
+            self.set_image(self.image_name)
             self.set_position(position)
 
         def upgrade(self, player):
@@ -332,9 +413,12 @@ class BonusFactory:
             return player
 
     class _BonusBeamPower(_Bonus):
+        image_name = 'beampower.gif'
+        kind = 'beampower'
+
         def __init__(self, position):
             super(BonusFactory._BonusBeamPower, self).__init__()
-            self.image, self.rect = load_image('beampower.gif')
+            self.set_image(self.image_name)
             self.set_position(position)
 
         def upgrade(self, player):
@@ -342,24 +426,34 @@ class BonusFactory:
             return player
 
     class _BonusIndestructable(_Bonus):
+        image_name = 'indestructable.gif'
+        kind = 'indestructable'
+
         def __init__(self, position):
             super(BonusFactory._BonusIndestructable, self).__init__()
-            self.image, self.rect = load_image('indestructable.gif')
+            self.set_image(self.image_name)
             self.set_position(position)
 
         def upgrade(self, player):
             return Indestructable(player)
 
+    @classmethod
+    def preload(cls):
+        """Prepares pulse frames and masks of bonuses and the player."""
+        for name in [Player.image_name] + [i.image_name for i in cls.bonuses]:
+            images.pulse(name, SKY_COLOR)
+            images.mask(name)
+
     @classmethod
     def create_bonus(cls):
-        bonus_probability = random.randrange(0, 1000)
+        bonus_probability = cls.rng.randrange(0, 1000)
         if bonus_probability == 0:
-            width = random.randrange(cls.window_margin,
-                                     window.width - cls.window_margin)
-            height = random.randrange(cls.window_margin,
-                                      window.height - cls.window_margin)
+            width = cls.rng.randrange(cls.window_margin,
+                                      window.width - cls.window_margin)
+            height = cls.rng.randrange(cls.window_margin,
+                                       window.height - cls.window_margin)
             position = (width, height)
-            bonus = random.choice(cls.bonuses)
+            bonus = cls.rng.choice(cls.bonuses)
             return bonus(position)
 
 
@@ -369,38 +463,60 @@ class TextObject(pygame.sprite.Sprite):
 
     def __init__(self):
         pygame.sprite.Sprite.__init__(self)
-        self.font = pygame.font.Font(self.font_path, self.font_size)
         self.color = Color(255, 255, 0)
+        self.font = get_font(self.font_size, self.font_path)
+        self.atlas = get_atlas(self.font_size, self.font_path, self.color)
+        self.text = TextBuffer(self.atlas)
 
+    def compose(self, *texts):
+        """Sets image to texts drawn from the atlas' glyphs."""
+        self.image = self.text.compose(texts)
 
-class Score(TextObject):
-    def __init__(self):
-        super(Score, self).__init__()
-        self.last = -1
-        self.score = 0
+
+class HudText(TextObject):
+    """
+    Label followed by a value, redrawn only when the value changes.
+
+    Label is one glyph of the atlas and the value is composed of
+    character glyphs, so a new field is just a label and a position.
+    """
+    label = ''
+    position = (10, 450)
+
+    def __init__(self, value):
+        super(HudText, self).__init__()
+        self.atlas.glyph(self.label)
+        self.last = None
+        self.value = value
         self.update()
-        self.rect = self.image.get_rect().move(10, 450)
+        self.rect = self.image.get_rect().move(self.position)
 
     def update(self):
-        if self.score != self.last:
-            self.last = self.score
-            msg = 'Score: {}'.format(self.score)
-            self.image = self.font.render(msg, 0, self.color)
+        if self.value != self.last:
+            self.last = self.value
+            self.compose(self.label, str(self.value))
+
 
+class Score(HudText):
+    label = 'Score: '
 
-class Difficulty(TextObject):
     def __init__(self):
-        super(Difficulty, self).__init__()
-        self.last = ''
-        self.difficulty = 'EASY'
-        self.update()
-        self.rect = self.image.get_rect().move(10, 450)
+        super(Score, self).__init__(0)
 
-    def update(self):
-        if self.difficulty != self.last:
-            self.last = self.difficulty
-            msg = 'Difficulty: {}'.format(self.difficulty)
-            self.image = self.font.render(msg, 0, self.color)
+
+class Level(HudText):
+    label = 'Level: '
+    position = (260, 450)
+
+    def __init__(self):
+        super(Level, self).__init__(1)
+
+
+class Difficulty(HudText):
+    label = 'Difficulty: '
+
+    def __init__(self):
+        super(Difficulty, self).__init__('EASY')
 
 
 # initialize bonuses
@@ -410,9 +526,7 @@ BonusFactory.bonuses = [
                             BonusFactory._BonusBeamPower,
                             BonusFactory._BonusIndestructable
                        ]
-# initialize strategy
 difficulty_gen = difficulty_generator()
-EnemyFactory.change_enemy_strategy(next(difficulty_gen))
 
 def _player_test():
     pygame.init()
@@ -425,7 +539,7 @@ def _player_test():
     beams = pygame.sprite.Group()
 
     Player.containers = all
-    Beam.containers = all, beams
+    PlayerBeam.containers = all, beams
 
     player = Player()
 
@@ -443,7 +557,7 @@ def _player_test():
         firing = keystate[K_SPACE]
         if not player.reloading and firing and \
            player.beam_limit > len(beams):
-            Beam(player.beam_pos())
+            PlayerBeam.create(player.beam_pos())
         player.reloading = firing
 
         player.move(left_right, up_down)
@@ -455,14 +569,14 @@ def _player_test():
         clock.tick(60)
 
 def _enemy_test():
+    from waves import WaveEngine
     global SCORE
     pygame.init()
     clock = pygame.time.Clock()
     screen = pygame.display.set_mode(window)
     pygame.display.set_caption('player test')
     screen.fill((255, 255, 255))
-    img = load_image('explosion.gif')[0]
-    Explosion.images = [img, pygame.transform.flip(img, 1, 1)]
+    Explosion.images = images.frames('explosion')
 
     all = pygame.sprite.RenderUpdates()
     enemy_beams = pygame.sprite.Group()
@@ -484,18 +598,19 @@ def _enemy_test():
     player = Indestructable(player)
 
     EnemyFactory.change_enemy_strategy('EASY')
+    waves = WaveEngine(random)
+    frame = 0
     done = 0
     while not done:
         for e in pygame.event.get():
             if e.type == QUIT or (e.type == KEYUP and e.key == K_ESCAPE):
                 done = 1
                 break
+        frame += 1
+        waves.update(frame, 1 + frame // waves.level_frames)
         if not int(random.random() * 10):
-            EnemyFactory.create_enemy(level=1,
-                                      objects=all)
             BonusFactory.create_bonus()
-            for i in enemies:
-                i.shot()
+        EnemyFactory.scheduler.tick()
 
         for alien in pygame.sprite.spritecollide(player, enemies, 1):
             Explosion(alien)
@@ -0,0 +1,165 @@
+import os
+import json
+import time
+import atexit
+import tempfile
+import threading
+import collections
+
+from assets import data_dir
+from settings import HIGHSCORE_FILE, HIGHSCORE_SIZE
+
+Entry = collections.namedtuple('Entry', 'score name')
+
+
+class HighscoreStore:
+    """
+    Leaderboards kept in memory and saved by a background thread.
+
+    Every board (e.g. one per difficulty) holds the best size entries.
+    submit() only changes the tables in memory and wakes the writer,
+    which waits delay seconds to batch further changes and then writes
+    all boards to a temporary file that replaces the old one, so a
+    crash leaves either the old or the new file, never half of one.
+    Boards of legacy text files (one score per line) are imported the
+    first time they are asked for.
+    """
+
+    def __init__(self, path, size=10, delay=0.5):
+        self.path = path
+        self.size = size
+        self.delay = delay
+        self.boards = None
+        self.changes = 0
+        self.saved = 0
+        self.closed = False
+        self.condition = threading.Condition()
+        self.writer = None
+        self.error = None
+
+    def top(self, board, count=None):
+        """Best entries of board, highest score first."""
+        with self.condition:
+            entries = self._board(board)
+            return list(entries[:count])
+
+    def scores(self, board):
+        """Scores of board sorted from the lowest, like the legacy file."""
+        return sorted(entry.score for entry in self.top(board))
+
+    def submit(self, score, name='', boards=()):
+        """
+        Adds score to boards and schedules a write.
+
+        Returns ranks (counted from 0) of the score on every board,
+        None where it didn't make it.
+        """
+        ranks = []
+        with self.condition:
+            for board in boards:
+                entries = self._board(board)
+                rank = len(entries)
+                for i, entry in enumerate(entries):
+                    if score > entry.score:
+                        rank = i
+                        break
+                if rank < self.size:
+                    entries.insert(rank, Entry(score, name))
+                    del entries[self.size:]
+                    ranks.append(rank)
+                else:
+                    ranks.append(None)
+            if any(rank is not None for rank in ranks):
+                self.changes += 1
+                self._start()
+                self.condition.notify_all()
+        return ranks
+
+    def flush(self):
+        """Blocks until every submitted score is on disk."""
+        with self.condition:
+            while self.saved < self.changes and self.writer:
+                self.condition.wait()
+
+    def close(self):
+        """Writes pending changes and stops the writer."""
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        if self.writer:
+            self.writer.join()
+            self.writer = None
+
+    def _board(self, board):
+        if self.boards is None:
+            self.boards = self._read()
+        entries = self.boards.get(board)
+        if entries is None:
+            entries = self.boards[board] = self._legacy(board)
+        return entries
+
+    def _read(self):
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path) as f:
+            data = json.load(f)
+        return {board: [Entry(*entry) for entry in entries]
+                for board, entries in data.items()}
+
+    def _legacy(self, board):
+        path = os.path.join(os.path.dirname(self.path), board + '.txt')
+        entries = []
+        if os.path.exists(path):
+            with open(path) as f:
+                entries = [Entry(int(line), '') for line in f if line.strip()]
+            entries.sort(key=lambda entry: -entry.score)
+        return entries[:self.size]
+
+    def _start(self):
+        if self.writer is None and not self.closed:
+            self.writer = threading.Thread(target=self._run,
+                                           name='highscores', daemon=True)
+            self.writer.start()
+            atexit.register(self.close)
+
+    def _run(self):
+        condition = self.condition
+        while True:
+            with condition:
+                while self.saved == self.changes and not self.closed:
+                    condition.wait()
+                if self.saved == self.changes:
+                    return
+                # let more scores arrive before writing them together
+                deadline = time.monotonic() + self.delay
+                while not self.closed and time.monotonic() < deadline:
+                    condition.wait(deadline - time.monotonic())
+                changes = self.changes
+                data = json.dumps({board: [list(entry) for entry in entries]
+                                   for board, entries in self.boards.items()},
+                                  separators=(',', ':'), sort_keys=True)
+            try:
+                self._write(data)
+            except OSError as error:
+                # boards are rewritten as a whole, next change tries again
+                self.error = error
+            with condition:
+                self.saved = changes
+                condition.notify_all()
+
+    def _write(self, data):
+        directory = os.path.dirname(self.path) or '.'
+        fd, temp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp, self.path)
+        except BaseException:
+            os.remove(temp)
+            raise
+
+
+store = HighscoreStore(os.path.join(data_dir, HIGHSCORE_FILE),
+                       HIGHSCORE_SIZE)
@@ -1,40 +1,68 @@
 import pygame
 from pygame.locals import *
+from fonts import get_font
+from highscores import store
+from settings import PLAYER_NAME
 
-if not pygame.display.get_init():
-    pygame.display.init()
 
-if not pygame.font.get_init():
-    pygame.font.init()
+panels = {}
 
 
-def get_scores(filename):
-    scores = []
-    with open('data/' + filename + '.txt') as f:
-        for line in f:
-            scores.append(int(line))
-    scores.sort()
-    return scores
+def get_scores(board):
+    """Scores of board sorted from the lowest."""
+    return store.scores(board)
 
-def display_highscore(filename, dest_surface):
-    scores = get_scores(filename)
+
+class HighscorePanel:
+    """High score table rendered once and again only when scores change."""
     font_size = 15
-    myfont = pygame.font.SysFont("monospace", font_size)
-    label = myfont.render('Highscore:', 1, (255, 255, 0))
-    dest_surface.blit(label, (10, 10))
-    for i, score in enumerate(reversed(scores)):
-        label = myfont.render(str(i + 1) + ': ' + str(score), 1, (255, 255, 0))
-        dest_surface.blit(label, (10, 10 + font_size + font_size*i))
-
-def save_score(filename, score):
-    scores = get_scores(filename)
-    if len(scores) == 5 and score > min(scores):
-        scores[0] = score
-    elif len(scores) < 5:
-        scores.append(score)
-    with open('data/' + filename + '.txt', 'w') as f:
-        for i in scores:
-            f.write(str(i) + '\n')
+    color = (255, 255, 0)
+    rows = 5
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.scores = None
+        self.surface = None
+
+    def draw(self, dest_surface, position=(10, 10)):
+        table = get_scores(self.filename)[-self.rows:]
+        if table != self.scores:
+            self.scores = table
+            self.surface = self.render(table)
+        return dest_surface.blit(self.surface, position)
+
+    def render(self, table):
+        font_size = self.font_size
+        myfont = get_font(font_size)
+        labels = [myfont.render('Highscore:', 1, self.color)]
+        for i, score in enumerate(reversed(table)):
+            labels.append(myfont.render(str(i + 1) + ': ' + str(score), 1,
+                                        self.color))
+        width = max(label.get_width() for label in labels)
+        height = font_size * len(labels) + labels[-1].get_height()
+        surface = pygame.Surface((width, height), SRCALPHA)
+        for i, label in enumerate(labels):
+            surface.blit(label, (0, font_size * i))
+        return surface
+
+
+def display_highscore(filename, dest_surface):
+    panel = panels.get(filename)
+    if panel is None:
+        panel = panels[filename] = HighscorePanel(filename)
+    return panel.draw(dest_surface)
+
+def save_score(board, score, name=PLAYER_NAME, difficulty=None):
+    """
+    Adds score to board and to the board of difficulty.
+
+    Tables change in memory right away, they're written to disk by the
+    store's background thread.
+    """
+    boards = [board]
+    if difficulty:
+        boards.append(difficulty)
+    return store.submit(score, name, boards)
 
 class Menu:
     lst = []
@@ -57,9 +85,13 @@ class Menu:
         field = pygame.Surface
         field_rect = pygame.Rect
         select_rect = pygame.Rect
+        normal = pygame.Surface
+        selected = pygame.Surface
 
     def __init__(self, lst, dest_surface):
         self.lst = lst
+        self.fields = []
+        self.dirty = []
         self.dest_surface = dest_surface
         self.field_count = len(self.lst)
         self.create_structure()
@@ -82,25 +114,36 @@ class Menu:
         return self.select_position
 
     def draw(self, move=0):
+        """
+        Draws menu from pre-rendered surfaces.
+
+        When selection moves only the two changed rows are drawn again.
+        Areas of dest_surface that changed are left in dirty.
+        """
+        old_position = self.select_position
         if move:
             self.select_position += move
             if self.select_position == -1:
                 self.select_position = self.field_count - 1
             self.select_position %= self.field_count
-        menu = pygame.Surface((self.menu_width, self.menu_height))
-        menu.fill(self.background_color)
-        select_rect = self.fields[self.select_position].select_rect
-        pygame.draw.rect(menu, self.select_color, select_rect)
-
-        for i in range(self.field_count):
-            menu.blit(self.fields[i].field, self.fields[i].field_rect)
-        self.dest_surface.blit(menu, self.paste_position)
+            self.dirty = [self._draw_row(old_position, False)]
+        else:
+            self.dirty = [self.dest_surface.blit(self.surface,
+                                                 self.paste_position)]
+        self.dirty.append(self._draw_row(self.select_position, True))
         return self.select_position
 
+    def _draw_row(self, position, selected):
+        field = self.fields[position]
+        row = field.selected if selected else field.normal
+        return self.dest_surface.blit(
+            row, field.select_rect.move(self.paste_position))
+
     def create_structure(self):
+        """Renders labels, whole menu and both looks of every row once."""
         shift = 0
         self.menu_height = 0
-        self.font = pygame.font.Font(self.font_path, self.font_size)
+        self.font = get_font(self.font_size, self.font_path)
         for i in range(self.field_count):
             self.fields.append(self.Field())
             self.fields[i].text = self.lst[i]
@@ -118,15 +161,26 @@ class Menu:
             left = self.fields[i].field_rect.left - shift
             top = self.fields[i].field_rect.top - shift
 
-            self.fields[i].select_rect = (left, top , width, height)
+            self.fields[i].select_rect = Rect(left, top , width, height)
             if width > self.menu_width:
                     self.menu_width = width
             self.menu_height += height
-        x = self.dest_surface.get_rect().centerx - self.menu_width / 2
-        y = self.dest_surface.get_rect().centery - self.menu_height / 2
+        x = self.dest_surface.get_rect().centerx - self.menu_width // 2
+        y = self.dest_surface.get_rect().centery - self.menu_height // 2
         mx, my = self.paste_position
         self.paste_position = (x + mx, y + my)
 
+        self.surface = pygame.Surface((self.menu_width, self.menu_height))
+        self.surface.fill(self.background_color)
+        for field in self.fields:
+            self.surface.blit(field.field, field.field_rect)
+            label_position = field.field_rect.move(-field.select_rect.left,
+                                                   -field.select_rect.top)
+            field.normal = self.surface.subsurface(field.select_rect).copy()
+            field.selected = pygame.Surface(field.select_rect.size)
+            field.selected.fill(self.select_color)
+            field.selected.blit(field.field, label_position)
+
 
 
 if __name__ == "__main__":
@@ -0,0 +1,600 @@
+import os
+import sys
+import json
+import time
+import random
+import struct
+import asyncio
+import argparse
+import threading
+import collections
+import subprocess
+import pygame
+from simulation import Simulation, State, IDLE, FPS
+from game_objects import Player, Beam, Explosion, EnemyFactory, \
+    BonusFactory
+from starfield import SKY_COLOR
+from assets import images
+from timestep import FixedTimestep
+from pipeline import Frame
+from replay import encode, decode
+
+HOST = '127.0.0.1'
+PORT = 5555
+MAGIC = b'SINP'
+VERSION = 2
+# magic, version, index of the player, number of players
+HELLO = struct.Struct('<4sBBB')
+# size of the snapshot that follows
+LENGTH = struct.Struct('<I')
+# frame, score, level, kills, bonuses, game over and how many
+# entities were removed, moved and sent whole
+HEADER = struct.Struct('<IIHIHBHHH')
+REMOVED = struct.Struct('<H')
+# id, dx, dy
+MOVED = struct.Struct('<Hbb')
+# id, kind, frame, x, y
+FULL = struct.Struct('<HBBhh')
+
+
+def sprite_kinds():
+    """
+    Image sequences by the kind of the sprites that show them.
+
+    Snapshots refer to an image by (kind, frame), numbered in the order
+    of this table. Server and clients build it the same way from the
+    image cache.
+    """
+    kinds = collections.OrderedDict()
+    for name in EnemyFactory.enemies:
+        kinds[name] = [images.get(name + '.gif')]
+    # plain and indestructable
+    kinds[Player.kind] = [images.get(Player.image_name)] + \
+        images.pulse(Player.image_name, SKY_COLOR)
+    kinds[Beam.kind] = [images.get('normal_beam.gif')]
+    kinds[Explosion.kind] = images.frames('explosion')
+    for bonus in BonusFactory.bonuses:
+        kinds[bonus.kind] = images.pulse(bonus.image_name, SKY_COLOR)
+    return kinds
+
+
+def pack(record, values):
+    """Packs values of records laid out one after another."""
+    fields = record.format[1:]
+    return struct.pack('<' + fields * (len(values) // len(fields)), *values)
+
+
+def delta(state, old, new):
+    """
+    Message that takes a client from entities old to new.
+
+    Entities are (kind, frame, x, y) by id. Unchanged entities are left
+    out, the ones that kept their image and moved less than 128 pixels
+    take four bytes, the rest eight. old is None for a full snapshot.
+    """
+    old = old or {}
+    removed = [i for i in old if i not in new]
+    moved = []
+    full = []
+    for i, entity in new.items():
+        before = old.get(i)
+        if before == entity:
+            continue
+        if before is not None and before[:2] == entity[:2]:
+            dx = entity[2] - before[2]
+            dy = entity[3] - before[3]
+            if -128 <= dx < 128 and -128 <= dy < 128:
+                moved.extend((i, dx, dy))
+                continue
+        full.append(i)
+        full.extend(entity)
+    body = b''.join([
+        HEADER.pack(state.frame, state.score, state.level, state.kills,
+                    state.bonuses, state.game_over, len(removed),
+                    len(moved) // 3, len(full) // 5),
+        pack(REMOVED, removed), pack(MOVED, moved), pack(FULL, full)])
+    return LENGTH.pack(len(body)) + body
+
+
+class Encoder:
+    """
+    Turns the sprites of a simulation into entities.
+
+    A sprite keeps its id for as long as it stays in the game, pooled
+    sprites get a new one when they come back. Ids wrap around and skip
+    the ones still in use, so the encoder can outlive a game. Sprites
+    are looked up by their kind, an image that isn't part of it is sent
+    as its first frame.
+    """
+
+    def __init__(self, kinds):
+        kinds = collections.OrderedDict(kinds)
+        for name in self.sprite_kinds():
+            if name not in kinds:
+                raise ValueError('no images for sprite kind {!r}'.format(name))
+        self.kinds = {name: (kind, {image: frame
+                                    for frame, image in enumerate(frames)})
+                      for kind, (name, frames) in enumerate(kinds.items())}
+        self.ids = {}
+        self.live = set()
+        self.next_id = 0
+
+    @staticmethod
+    def sprite_kinds():
+        """Kinds of every sprite that can be in a simulation."""
+        return (list(EnemyFactory.enemies) +
+                [Player.kind, Beam.kind, Explosion.kind] +
+                [i.kind for i in BonusFactory.bonuses])
+
+    def new_id(self):
+        """Next id that no sprite holds."""
+        live = self.live
+        if len(live) > 0xffff:
+            raise RuntimeError('more than 65536 entities')
+        i = self.next_id
+        while i in live:
+            i = (i + 1) & 0xffff
+        self.next_id = (i + 1) & 0xffff
+        live.add(i)
+        return i
+
+    def capture(self, simulation):
+        """Entities of the simulation by id."""
+        sprites = simulation.all.spritedict
+        ids = self.ids
+        kinds = self.kinds
+        entities = {}
+        for sprite in sprites:
+            i = ids.get(sprite)
+            if i is None:
+                i = ids[sprite] = self.new_id()
+            kind, frames = kinds[sprite.kind]
+            rect = sprite.rect
+            entities[i] = (kind, frames.get(sprite.image, 0), rect.x, rect.y)
+        if len(ids) > len(entities):
+            for sprite in [i for i in ids if i not in sprites]:
+                self.live.discard(ids.pop(sprite))
+        return entities
+
+
+class Mirror:
+    """Entities of the server's game, as a client puts them together."""
+
+    def __init__(self):
+        self.entities = {}
+        self.state = State(0, 0, 1, 0, 0, False)
+
+    def apply(self, body):
+        """Updates entities with a snapshot and returns its state."""
+        frame, score, level, kills, bonuses, game_over, removed, moved, \
+            full = HEADER.unpack_from(body)
+        entities = self.entities
+        offset = HEADER.size
+        end = offset + removed * REMOVED.size
+        for i, in REMOVED.iter_unpack(body[offset:end]):
+            del entities[i]
+        offset, end = end, end + moved * MOVED.size
+        for i, dx, dy in MOVED.iter_unpack(body[offset:end]):
+            entity = entities[i]
+            entity[2] += dx
+            entity[3] += dy
+        for i, kind, image, x, y in FULL.iter_unpack(body[end:]):
+            entities[i] = [kind, image, x, y]
+        self.state = State(frame, score, level, kills, bonuses,
+                           bool(game_over))
+        return self.state
+
+    def sprites(self, kinds):
+        """(image, position) pairs ready for Surface.blits."""
+        return tuple((kinds[kind][image], (x, y))
+                     for kind, image, x, y in self.entities.values())
+
+
+class Connection:
+    """A player on the server and the last entities it was sent."""
+
+    def __init__(self, index, writer):
+        self.index = index
+        self.writer = writer
+        self.baseline = None
+        self.task = None
+        self.skipped = 0
+        self.closed = False
+
+
+class TickStats:
+    """CPU time of server ticks and sizes of the snapshots it sends."""
+
+    def __init__(self):
+        self.step = []
+        self.send = []
+        self.sizes = []
+        self.full = []
+        self.entities = []
+        self.sent = 0
+        self.process = 0.0
+
+    def report(self, rate, clients):
+        ticks = len(self.step)
+        if not ticks:
+            return {'ticks': 0}
+        cpu = sorted(step + send for step, send in zip(self.step, self.send))
+        # everything the process did, event loop and sockets included
+        process = self.process / ticks
+        return {
+            'ticks': ticks,
+            'step_ms': sum(self.step) / ticks * 1000,
+            'send_ms': sum(self.send) / ticks * 1000,
+            'tick_ms': sum(cpu) / ticks * 1000,
+            'tick_p99_ms': cpu[min(ticks - 1, ticks * 99 // 100)] * 1000,
+            'entities': sum(self.entities) / max(len(self.entities), 1),
+            'delta_bytes': sum(self.sizes) / max(len(self.sizes), 1),
+            'full_bytes': sum(self.full) / max(len(self.full), 1),
+            'bytes_per_sec': self.sent / max(clients, 1) / ticks * rate,
+            'process_ms': process * 1000,
+            'matches_per_core': 1.0 / (process * rate) if process else None,
+        }
+
+
+class Server:
+    """
+    Hosts one match and is the only one running its simulation.
+
+    Players join over TCP and get their index. From then on each one
+    sends a byte of encoded inputs (see replay.encode) whenever its keys
+    change and the server keeps the latest. Every tick the simulation
+    steps with those inputs and every player is sent a delta from the
+    last entities it got. TCP delivers deltas in order, so nothing has
+    to be acknowledged; a player whose socket buffer is full skips
+    ticks and catches up with one bigger delta. Players with the same
+    baseline share the encoded message.
+
+    The match starts when all players joined and ends at game over
+    (with rematch a new game starts instead), after ticks or when
+    every player left.
+    """
+    backlog = 64 * 1024
+
+    def __init__(self, players=2, difficulty='EASY', seed=None, rate=FPS,
+                 ticks=None, rematch=False):
+        self.players = players
+        self.difficulty = difficulty
+        self.seed = seed if seed is not None else random.randrange(2**32)
+        self.rate = rate
+        self.ticks = ticks
+        self.rematch = rematch
+        self.clients = []
+        self.inputs = [IDLE] * players
+        self.stats = TickStats()
+        self.port = None
+
+    async def serve(self, host=HOST, port=PORT, ready=None):
+        """Runs the match, ready is called with the port when listening."""
+        self.encoder = Encoder(sprite_kinds())
+        self.full = asyncio.Event()
+        server = await asyncio.start_server(self.join, host, port)
+        self.port = server.sockets[0].getsockname()[1]
+        if ready:
+            ready(self.port)
+        try:
+            await self.full.wait()
+            await self.run()
+        finally:
+            server.close()
+            for client in self.clients:
+                client.writer.close()
+            # players see the end of the stream and leave
+            if self.clients:
+                await asyncio.wait([i.task for i in self.clients])
+            await server.wait_closed()
+
+    async def join(self, reader, writer):
+        if len(self.clients) == self.players:
+            writer.close()
+            return
+        client = Connection(len(self.clients), writer)
+        client.task = asyncio.current_task()
+        self.clients.append(client)
+        writer.write(HELLO.pack(MAGIC, VERSION, client.index, self.players))
+        if len(self.clients) == self.players:
+            self.full.set()
+        try:
+            while True:
+                data = await reader.read(64)
+                if not data:
+                    break
+                # only the latest inputs count
+                self.inputs[client.index] = decode(data[-1])
+        except ConnectionError:
+            pass
+        finally:
+            self.inputs[client.index] = IDLE
+            client.closed = True
+
+    async def run(self):
+        stats = self.stats
+        clock = time.process_time
+        timestep = FixedTimestep(self.rate)
+        loop = asyncio.get_running_loop()
+        simulation = Simulation(self.difficulty, self.seed,
+                                players=self.players)
+        games = 1
+        started = clock()
+        last = loop.time()
+        while any(not client.closed for client in self.clients):
+            now = loop.time()
+            ticks = timestep.advance(now - last)
+            last = now
+            state = None
+            stepped = 0
+            for i in range(ticks):
+                start = clock()
+                state = simulation.step(*self.inputs)
+                stats.step.append(clock() - start)
+                stepped += 1
+                if state.game_over or len(stats.step) == self.ticks:
+                    break
+            if state is not None:
+                start = clock()
+                self.broadcast(simulation, state)
+                # sending is shared by the ticks it covered
+                stats.send.extend([(clock() - start) / stepped] * stepped)
+                if len(stats.step) == self.ticks:
+                    break
+                if state.game_over:
+                    if not self.rematch:
+                        break
+                    simulation.end()
+                    simulation = Simulation(self.difficulty, self.seed + games,
+                                            players=self.players)
+                    games += 1
+            await asyncio.sleep(max(timestep.dt - timestep.accumulator, 0))
+        stats.process = clock() - started
+        simulation.end()
+        for client in self.clients:
+            if not client.closed:
+                await client.writer.drain()
+
+    def broadcast(self, simulation, state):
+        stats = self.stats
+        entities = self.encoder.capture(simulation)
+        messages = {}
+        for client in self.clients:
+            if client.closed:
+                continue
+            if client.writer.transport.get_write_buffer_size() > self.backlog:
+                client.skipped += 1
+                continue
+            key = id(client.baseline)
+            message = messages.get(key)
+            if message is None:
+                message = messages[key] = delta(state, client.baseline,
+                                                entities)
+            client.writer.write(message)
+            client.baseline = entities
+            stats.sent += len(message)
+        if messages:
+            stats.sizes.append(min(len(i) for i in messages.values()))
+            stats.entities.append(len(entities))
+        if state.frame % self.rate == 0:
+            stats.full.append(len(delta(state, None, entities)))
+
+
+class Client(threading.Thread):
+    """
+    Plays on a server, like Pipeline but the simulation runs remotely.
+
+    The thread keeps the connection: inputs passed to send() go out when
+    they change and every snapshot becomes a Frame, latest() hands the
+    newest one to the game and drops the rest. When the server goes
+    away the last frame is marked game over.
+    """
+
+    def __init__(self, address):
+        super(Client, self).__init__(name='client', daemon=True)
+        self.address = address
+        # images need the display, which belongs to the main thread
+        self.kinds = list(sprite_kinds().values())
+        self.mirror = Mirror()
+        self.inputs = IDLE
+        self.frame = None
+        self.lock = threading.Lock()
+        self.loop = None
+        self.writer = None
+        self.index = None
+        self.received = 0
+        self.error = None
+
+    def send(self, inputs):
+        if inputs != self.inputs:
+            self.inputs = inputs
+            if self.loop is not None:
+                self.loop.call_soon_threadsafe(self._write, inputs)
+
+    def latest(self):
+        """Newest frame, None if none arrived since the last call."""
+        with self.lock:
+            frame, self.frame = self.frame, None
+            return frame
+
+    def stop(self):
+        if self.is_alive():
+            if self.loop is not None:
+                self.loop.call_soon_threadsafe(self.writer.close)
+            self.join()
+
+    def run(self):
+        try:
+            asyncio.run(self._play())
+        except Exception as error:
+            # raised again on the main thread by the game
+            self.error = error
+
+    async def _play(self):
+        reader, self.writer = await asyncio.open_connection(*self.address)
+        self.index, players = await receive_hello(reader)
+        self.loop = asyncio.get_running_loop()
+        self._write(self.inputs)
+        mirror = self.mirror
+        while True:
+            body = await receive(reader)
+            if body is None:
+                break
+            self.received += LENGTH.size + len(body)
+            state = mirror.apply(body)
+            self._publish(Frame(state, mirror.sprites(self.kinds),
+                                {'sprites': len(mirror.entities)}))
+        if not mirror.state.game_over:
+            self._publish(Frame(mirror.state._replace(game_over=True),
+                                mirror.sprites(self.kinds),
+                                {'sprites': len(mirror.entities)}))
+
+    def _write(self, inputs):
+        if not self.writer.is_closing():
+            self.writer.write(bytes([encode(inputs)]))
+
+    def _publish(self, frame):
+        with self.lock:
+            self.frame = frame
+
+
+async def receive_hello(reader):
+    """Index of the player and number of players sent by the server."""
+    magic, version, index, players = HELLO.unpack(
+        await reader.readexactly(HELLO.size))
+    if magic != MAGIC or version != VERSION:
+        raise ValueError('not a game server')
+    return index, players
+
+
+async def receive(reader):
+    """Body of the next snapshot, None when the server is gone."""
+    try:
+        size, = LENGTH.unpack(await reader.readexactly(LENGTH.size))
+        return await reader.readexactly(size)
+    except (asyncio.IncompleteReadError, ConnectionError):
+        return None
+
+
+async def bot(address, seed=None, hold=20):
+    """
+    Joins a server and presses random keys until the server is gone.
+
+    Keys are held for hold frames on average. Returns how many
+    snapshots and bytes were received.
+    """
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection(*address)
+    await receive_hello(reader)
+    mirror = Mirror()
+    snapshots = received = 0
+    while True:
+        body = await receive(reader)
+        if body is None:
+            break
+        mirror.apply(body)
+        snapshots += 1
+        received += LENGTH.size + len(body)
+        if rng.randrange(hold) == 0:
+            writer.write(bytes([encode((rng.randint(-1, 1),
+                                        rng.randint(-1, 1),
+                                        rng.randint(0, 1)))]))
+    writer.close()
+    return snapshots, received
+
+
+def bench(matches, players, seconds, difficulty):
+    """
+    Runs matches of bots in local processes and returns server stats.
+
+    Every match has a server process and a process per player, servers
+    start a new game at game over until seconds of ticks were played.
+    """
+    script = os.path.abspath(__file__)
+    servers = []
+    bots = []
+    for match in range(matches):
+        server = subprocess.Popen(
+            [sys.executable, script, 'serve', '-n', str(players),
+             '-d', difficulty, '-s', str(match), '-p', '0', '--rematch',
+             '--ticks', str(seconds * FPS), '--json'],
+            stdout=subprocess.PIPE, universal_newlines=True)
+        line = server.stdout.readline()
+        while not line.startswith('listening on'):
+            line = server.stdout.readline()
+        port = line.split(':')[-1].strip()
+        servers.append(server)
+        for player in range(players):
+            bots.append(subprocess.Popen(
+                [sys.executable, script, 'bot', '-p', port,
+                 '-s', str(match * players + player)],
+                stdout=subprocess.DEVNULL))
+    reports = [json.loads(server.communicate()[0].splitlines()[-1])
+               for server in servers]
+    for i in bots:
+        i.wait()
+    return reports
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Play over the network with an authoritative server.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    serve = commands.add_parser('serve', help='host a match')
+    serve.add_argument('-n', '--players', type=int, default=2)
+    serve.add_argument('-d', '--difficulty', default='EASY')
+    serve.add_argument('-s', '--seed', type=int, default=None)
+    serve.add_argument('--host', default=HOST)
+    serve.add_argument('-p', '--port', type=int, default=PORT)
+    serve.add_argument('--ticks', type=int, default=None,
+                       help='end the match after ticks')
+    serve.add_argument('--rematch', action='store_true',
+                       help='start a new game at game over')
+    serve.add_argument('--json', action='store_true',
+                       help='print stats as JSON')
+    play = commands.add_parser('bot', help='join a match, press random keys')
+    play.add_argument('--host', default=HOST)
+    play.add_argument('-p', '--port', type=int, default=PORT)
+    play.add_argument('-s', '--seed', type=int, default=None)
+    measure = commands.add_parser(
+        'bench', help='measure servers with bots in local processes')
+    measure.add_argument('-m', '--matches', type=int, default=1)
+    measure.add_argument('-n', '--players', type=int, default=2)
+    measure.add_argument('-d', '--difficulty', default='HARD')
+    measure.add_argument('-t', '--time', type=int, default=10,
+                         help='seconds of every match')
+    args = parser.parse_args()
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+    if args.command == 'bot':
+        snapshots, received = asyncio.run(
+            bot((args.host, args.port), args.seed))
+        print('{} snapshots, {} bytes'.format(snapshots, received))
+        return
+
+    if args.command == 'bench':
+        reports = bench(args.matches, args.players, args.time,
+                        args.difficulty)
+        for name in 'tick_ms', 'tick_p99_ms', 'step_ms', 'send_ms', \
+                    'process_ms', 'entities', 'delta_bytes', 'full_bytes', \
+                    'bytes_per_sec', 'matches_per_core':
+            values = [i[name] for i in reports]
+            print('{:<18} {:>10.3f}'.format(name, sum(values) / len(values)))
+        return
+
+    pygame.display.init()
+    server = Server(args.players, args.difficulty, args.seed, FPS,
+                    args.ticks, args.rematch)
+    asyncio.run(server.serve(
+        args.host, args.port,
+        lambda port: print('listening on {}:{}'.format(args.host, port),
+                           flush=True)))
+    report = server.stats.report(FPS, args.players)
+    if args.json:
+        print(json.dumps(report))
+    else:
+        for name, value in report.items():
+            print(name, value)
+
+if __name__ == '__main__':
+    main()
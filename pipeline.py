@@ -0,0 +1,139 @@
+import time
+import threading
+import collections
+from timestep import FixedTimestep
+from simulation import IDLE
+
+Frame = collections.namedtuple('Frame', 'state sprites counts')
+
+
+def snapshot(simulation, state):
+    """
+    Frame of the simulation's current state.
+
+    sprites is a tuple of (image, position) pairs ready for
+    Surface.blits, in the order BatchedRenderUpdates would draw them.
+    Images are shared and never changed, positions are copied, so a
+    frame can be drawn while the simulation goes on.
+    """
+    group = simulation.all
+    sprites = [(i.image, i.rect.topleft)
+               for i in sorted(group.spritedict, key=group.rank)]
+    store = simulation.projectiles
+    if store is not None and store.count:
+        n = store.count
+        images = store.images
+        sprites.extend((images[kind], (x, y)) for kind, x, y, alive in zip(
+            store.kind[:n].tolist(), store.x[:n].tolist(),
+            store.y[:n].tolist(), store.alive[:n].tolist()) if alive)
+    return Frame(state, tuple(sprites), simulation.counts())
+
+
+class Pipeline(threading.Thread):
+    """
+    Runs the simulation on its own thread and hands frames to rendering.
+
+    The thread steps the simulation rate times a second with the latest
+    inputs sent by the main thread and publishes a Frame after every
+    batch of ticks. Frames wait in a queue of size, when rendering falls
+    behind the oldest frame is dropped, and latest() skips to the newest
+    one, so neither side waits for the other. Display and events stay on
+    the main thread, which SDL requires on some platforms.
+    """
+
+    def __init__(self, simulation, step=None, rate=60, max_ticks=5, size=2):
+        super(Pipeline, self).__init__(name='simulation', daemon=True)
+        self.simulation = simulation
+        self.step = step or simulation.step
+        self.timestep = FixedTimestep(rate, max_ticks)
+        self.inputs = IDLE
+        self.frames = collections.deque()
+        self.size = size
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.published = 0
+        self.dropped = 0
+        self.skipped = 0
+        self.error = None
+
+    def send(self, inputs):
+        """Inputs used by the following ticks."""
+        self.inputs = inputs
+
+    def latest(self):
+        """Newest frame, None if none was published since the last call."""
+        with self.lock:
+            if not self.frames:
+                return None
+            frame = self.frames.pop()
+            self.skipped += len(self.frames)
+            self.frames.clear()
+            return frame
+
+    def stop(self):
+        self.stopped.set()
+        if self.is_alive():
+            self.join()
+
+    def run(self):
+        try:
+            self._loop()
+        except Exception as error:
+            # raised again on the main thread by the game
+            self.error = error
+
+    def _loop(self):
+        timestep = self.timestep
+        clock = time.perf_counter
+        last = clock()
+        while not self.stopped.is_set():
+            now = clock()
+            ticks = timestep.advance(now - last)
+            last = now
+            state = None
+            for i in range(ticks):
+                state = self.step(self.inputs)
+                if state.game_over:
+                    break
+            if state is not None:
+                self._publish(snapshot(self.simulation, state))
+                if state.game_over:
+                    return
+            self.stopped.wait(max(timestep.dt - timestep.accumulator, 0))
+
+    def _publish(self, frame):
+        with self.lock:
+            if len(self.frames) == self.size:
+                self.frames.popleft()
+                self.dropped += 1
+            self.frames.append(frame)
+            self.published += 1
+
+
+class FrameLayer:
+    """
+    Draws the sprites of a Frame like a RenderUpdates group.
+
+    clear() and draw() keep track of drawn areas, so a layer can be
+    passed to Renderer.draw together with sprite groups.
+    """
+
+    def __init__(self):
+        self.frame = None
+        self.drawn = []
+
+    def clear(self, surface, bgd):
+        for rect in self.drawn:
+            surface.blit(bgd, rect, rect)
+
+    def draw(self, surface):
+        drawn = []
+        if self.frame is not None and self.frame.sprites:
+            drawn = surface.blits(self.frame.sprites)
+        dirty = self.drawn + drawn
+        self.drawn = drawn
+        return dirty
+
+    def empty(self):
+        self.frame = None
+        self.drawn = []
@@ -0,0 +1,87 @@
+import abc
+import pygame
+
+pools = {}
+
+
+class SpritePool:
+    """
+    Bounded store of killed sprites of one class, ready to be reused.
+
+    When the pool is full killed sprites are left to the garbage
+    collector. Counters tell how many sprites were built, reused,
+    returned and dropped.
+    """
+
+    def __init__(self, name, size):
+        self.name = name
+        self.size = size
+        self.free = []
+        self.created = 0
+        self.reused = 0
+        self.released = 0
+        self.dropped = 0
+        pools[name] = self
+
+    def acquire(self):
+        """Returns a free sprite or None when the pool is empty."""
+        if self.free:
+            self.reused += 1
+            return self.free.pop()
+        self.created += 1
+        return None
+
+    def release(self, sprite):
+        if len(self.free) < self.size:
+            self.released += 1
+            self.free.append(sprite)
+        else:
+            self.dropped += 1
+
+    def clear(self):
+        del self.free[:]
+
+    def stats(self):
+        return {'free': len(self.free), 'size': self.size,
+                'created': self.created, 'reused': self.reused,
+                'released': self.released, 'dropped': self.dropped}
+
+
+class Pooled(metaclass=abc.ABCMeta):
+    """
+    Mixin for sprites that are recycled instead of thrown away.
+
+    Subclass sets pool and moves its setup from __init__ to reset, so
+    that create(...) can either build a new sprite or reset a killed one
+    and put it back into its containers. reset should move the sprite's
+    own rect rather than assign a new one.
+    """
+    pool = None
+
+    def __init__(self, *args, **kwargs):
+        pygame.sprite.Sprite.__init__(self, self.containers)
+        self.rect = pygame.Rect(0, 0, 0, 0)
+        self.reset(*args, **kwargs)
+
+    @abc.abstractmethod
+    def reset(self, *args, **kwargs):
+        """Sets the sprite up for a new life, takes arguments of create."""
+
+    @classmethod
+    def create(cls, *args, **kwargs):
+        sprite = cls.pool.acquire()
+        if sprite is None:
+            return cls(*args, **kwargs)
+        sprite.reset(*args, **kwargs)
+        sprite.add(sprite.containers)
+        return sprite
+
+    def kill(self):
+        if self.alive():
+            pygame.sprite.Sprite.kill(self)
+            self.pool.release(self)
+
+
+def stats():
+    """Statistics of every pool by name."""
+    return {name: pool.stats() for name, pool in pools.items()}
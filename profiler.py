@@ -0,0 +1,156 @@
+import csv
+import json
+import time
+import collections
+from pygame.locals import *
+from game_objects import TextObject
+
+
+class NullProfiler:
+    """Profiler that measures nothing, used when profiling is off."""
+
+    def begin_frame(self):
+        pass
+
+    def mark(self, phase):
+        pass
+
+    def end_frame(self, counts=None):
+        pass
+
+
+class FrameProfiler(NullProfiler):
+    """
+    Measures how long each phase of a frame takes.
+
+    begin_frame() starts the clock, every mark(phase) charges the time
+    since the previous mark to the phase and end_frame() stores the frame.
+    The last history frames are kept for statistics and export.
+    """
+
+    def __init__(self, history=3600):
+        self.frames = collections.deque(maxlen=history)
+        self.phases = []
+        self.current = None
+        self.start = self.last = 0.0
+        self.count = 0
+
+    def begin_frame(self):
+        self.current = {}
+        self.start = self.last = time.perf_counter()
+
+    def mark(self, phase):
+        if self.current is None:
+            return
+        now = time.perf_counter()
+        self.current[phase] = self.current.get(phase, 0.0) + now - self.last
+        self.last = now
+        if phase not in self.phases:
+            self.phases.append(phase)
+
+    def end_frame(self, counts=None):
+        if self.current is None:
+            return
+        now = time.perf_counter()
+        self.count += 1
+        self.frames.append((self.count, self.start, now - self.start,
+                            self.current, counts or {}))
+        self.current = None
+
+    def frame_times(self):
+        return sorted(frame[2] for frame in self.frames)
+
+    def percentile(self, p):
+        """Frame time in seconds that p percent of frames stay under."""
+        times = self.frame_times()
+        if not times:
+            return 0.0
+        return times[min(len(times) - 1, int(len(times) * p / 100))]
+
+    def fps(self, frames=60):
+        """Frames per second over the last frames."""
+        recent = list(self.frames)[-frames:]
+        if len(recent) < 2:
+            return 0.0
+        return (len(recent) - 1) / (recent[-1][1] - recent[0][1])
+
+    def rows(self):
+        """Stored frames as dictionaries, times in milliseconds."""
+        for number, start, total, phases, counts in self.frames:
+            row = {'frame': number, 'total': total * 1000}
+            for phase in self.phases:
+                row[phase] = phases.get(phase, 0.0) * 1000
+            row.update(counts)
+            yield row
+
+    def export(self, path):
+        """Writes stored frames to a .json or .csv trace."""
+        rows = list(self.rows())
+        with open(path, 'w', newline='') as f:
+            if path.endswith('.json'):
+                json.dump({'p50': self.percentile(50) * 1000,
+                           'p99': self.percentile(99) * 1000,
+                           'frames': rows}, f)
+            else:
+                fields = []
+                for row in rows:
+                    fields.extend(i for i in row if i not in fields)
+                writer = csv.DictWriter(f, fields, restval=0)
+                writer.writeheader()
+                writer.writerows(rows)
+
+
+class StartupTimer:
+    """
+    Measures how long each phase of startup takes.
+
+    Clock starts at start (now by default), every mark(phase) records
+    the time since the previous mark. Phases are kept in order.
+    """
+
+    def __init__(self, start=None):
+        self.start = self.last = start or time.perf_counter()
+        self.phases = collections.OrderedDict()
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.phases[phase] = self.phases.get(phase, 0.0) + now - self.last
+        self.last = now
+
+    def total(self):
+        return self.last - self.start
+
+    def report(self):
+        lines = ['{:<12} {:>8.1f} ms'.format(phase, seconds * 1000)
+                 for phase, seconds in self.phases.items()]
+        lines.append('{:<12} {:>8.1f} ms'.format('total', self.total() * 1000))
+        return '\n'.join(lines)
+
+
+class ProfilerOverlay(TextObject):
+    """Shows FPS, frame time percentiles and sprite counts."""
+    font_size = 16
+    refresh = 30
+
+    def __init__(self, profiler):
+        super(ProfilerOverlay, self).__init__()
+        self.profiler = profiler
+        self.frames = 0
+        self.render()
+        self.rect = self.image.get_rect().move(10, 10)
+
+    def update(self):
+        self.frames += 1
+        if self.frames % self.refresh == 0:
+            self.render()
+
+    def render(self):
+        profiler = self.profiler
+        msg = 'FPS {:.0f}  p50 {:.1f} ms  p99 {:.1f} ms'.format(
+            profiler.fps(), profiler.percentile(50) * 1000,
+            profiler.percentile(99) * 1000)
+        if profiler.frames:
+            counts = profiler.frames[-1][4]
+            msg += ''.join('  {} {}'.format(name, count)
+                           for name, count in counts.items())
+        self.compose(msg)
@@ -0,0 +1,121 @@
+import pygame
+from pygame.locals import *
+from starfield import SKY_COLOR
+from settings import FULL_FLIP
+from profiler import NullProfiler
+
+
+class Renderer:
+    """
+    Draws game frames and pushes only the changed areas to the display.
+
+    Background is rendered once and used to erase sprites, stars are
+    erased and drawn pixel by pixel and every touched area ends up in
+    one display update per frame. With full_flip whole frame is redrawn
+    and flipped instead, which is useful to compare both modes.
+    """
+    max_star_rects = 1024
+
+    def __init__(self, surface, stars, full_flip=FULL_FLIP):
+        self.surface = surface
+        self.stars = stars
+        self.full_flip = full_flip
+        self.background = pygame.Surface(surface.get_size()).convert(surface)
+        self.background.fill(SKY_COLOR)
+        self.dirty = []
+        self.profiler = NullProfiler()
+
+    def reset(self):
+        """Paints whole background, e.g. when the game leaves the menu."""
+        self.surface.blit(self.background, (0, 0))
+        self.stars.drawn = None
+        self.dirty = [self.surface.get_rect()]
+
+    def draw(self, *groups, steps=1.0):
+        """
+        Draws one frame of given sprite groups and updates display.
+
+        Stars move by steps frames of 1/60 s, the time the frame shows.
+        """
+        profiler = self.profiler
+        if self.full_flip:
+            self.surface.blit(self.background, (0, 0))
+            self.stars.move(steps)
+            self.stars.draw(self.surface)
+            profiler.mark('background')
+            for group in groups:
+                group.draw(self.surface)
+            profiler.mark('draw')
+            pygame.display.flip()
+            profiler.mark('display')
+            self.dirty = []
+            return
+
+        dirty = self.dirty
+        for group in groups:
+            group.clear(self.surface, self.background)
+        dirty.extend(self._star_rects(self.stars.drawn))
+        self.stars.erase(self.surface)
+        self.stars.move(steps)
+        self.stars.draw(self.surface)
+        dirty.extend(self._star_rects(self.stars.drawn))
+        profiler.mark('background')
+        for group in groups:
+            dirty.extend(group.draw(self.surface))
+        profiler.mark('draw')
+        pygame.display.update(dirty)
+        profiler.mark('display')
+        self.dirty = []
+
+    def _star_rects(self, drawn):
+        """One pixel rects of drawn stars, whole screen if there are many."""
+        if drawn is None:
+            return []
+        xs, ys = drawn
+        if len(xs) > self.max_star_rects:
+            return [self.surface.get_rect()]
+        return [Rect(x, y, 1, 1) for x, y in zip(xs.tolist(), ys.tolist())]
+
+
+class BatchedRenderUpdates(pygame.sprite.RenderUpdates):
+    """
+    RenderUpdates that draws all sprites with one Surface.blits call.
+
+    Sprites sharing an image are drawn next to each other, in the order
+    their images were first seen, which also keeps the stacking of
+    sprite types stable between frames. draw() returns dirty rects just
+    like RenderUpdates.draw.
+    """
+
+    def __init__(self, *sprites):
+        self.ranks = {}
+        super(BatchedRenderUpdates, self).__init__(*sprites)
+
+    def rank(self, sprite):
+        ranks = self.ranks
+        image = sprite.image
+        rank = ranks.get(image)
+        if rank is None:
+            rank = ranks[image] = len(ranks)
+        return rank
+
+    def draw(self, surface, bgsurf=None, special_flags=0):
+        sprites = sorted(self.spritedict, key=self.rank)
+        drawn = surface.blits([(i.image, i.rect, None, special_flags)
+                               for i in sprites])
+        spritedict = self.spritedict
+        dirty = self.lostsprites
+        self.lostsprites = []
+        dirty_append = dirty.append
+        for sprite, new_rect in zip(sprites, drawn):
+            old_rect = spritedict[sprite]
+            if old_rect:
+                if new_rect.colliderect(old_rect):
+                    dirty_append(new_rect.union(old_rect))
+                else:
+                    dirty_append(new_rect)
+                    dirty_append(old_rect)
+            else:
+                dirty_append(new_rect)
+            spritedict[sprite] = new_rect
+        return dirty
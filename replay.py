@@ -0,0 +1,180 @@
+import os
+import sys
+import time
+import struct
+import argparse
+import collections
+import pygame
+from simulation import Simulation, Inputs, policies
+
+MAGIC = b'SIRP'
+VERSION = 6
+# magic, version, seed, frames, digest of the final frame,
+# entity store flag, difficulty size
+HEADER = struct.Struct('<4sBQIIBB')
+# encoded inputs and how many frames in a row they were held
+RUN = struct.Struct('<BH')
+
+Log = collections.namedtuple(
+    'Log', 'seed difficulty entity_store frames digest runs')
+
+
+def encode(inputs):
+    """Packs (left_right, up_down, firing) into one byte."""
+    left_right, up_down, firing = inputs
+    return (left_right + 1) | (up_down + 1) << 2 | bool(firing) << 4
+
+
+def decode(byte):
+    return Inputs(left_right=(byte & 3) - 1, up_down=(byte >> 2 & 3) - 1,
+                  firing=byte >> 4 & 1)
+
+
+class Recorder:
+    """
+    Collects inputs of a session as run-length encoded bytes.
+
+    One frame of input takes one byte and repeated inputs share a run,
+    so a held key costs three bytes however long it is held.
+    """
+
+    def __init__(self, simulation):
+        self.simulation = simulation
+        self.runs = []
+
+    def record(self, inputs):
+        byte = encode(inputs)
+        runs = self.runs
+        if runs and runs[-1][0] == byte and runs[-1][1] < 0xffff:
+            runs[-1][1] += 1
+        else:
+            runs.append([byte, 1])
+
+    def step(self, inputs):
+        """Records inputs and passes them to the simulation."""
+        self.record(inputs)
+        return self.simulation.step(inputs)
+
+    def save(self, path):
+        simulation = self.simulation
+        difficulty = simulation.difficulty.encode('ascii')
+        with open(path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, simulation.seed,
+                                simulation.frame, simulation.digest(),
+                                simulation.projectiles is not None,
+                                len(difficulty)))
+            f.write(difficulty)
+            f.write(b''.join(RUN.pack(*run) for run in self.runs))
+
+
+def load(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    magic, version, seed, frames, digest, entity_store, size = \
+        HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError('{} is not a replay file'.format(path))
+    offset = HEADER.size
+    difficulty = data[offset:offset + size].decode('ascii')
+    runs = list(RUN.iter_unpack(data[offset + size:]))
+    return Log(seed, difficulty, bool(entity_store), frames, digest, runs)
+
+
+def inputs_of(log):
+    """Yields inputs of every recorded frame."""
+    for byte, count in log.runs:
+        inputs = decode(byte)
+        for i in range(count):
+            yield inputs
+
+
+def replay(log, frame_callback=None):
+    """
+    Plays the log back and returns the simulation in its final state.
+
+    Without frame_callback frames are stepped as fast as possible,
+    otherwise it is called with the simulation after every frame.
+    """
+    simulation = Simulation(log.difficulty, log.seed, log.entity_store)
+    for inputs in inputs_of(log):
+        simulation.step(inputs)
+        if frame_callback:
+            frame_callback(simulation)
+    return simulation
+
+
+def record(path, difficulty, seed, policy, max_frames, entity_store=False):
+    """Plays a session with a policy and saves its inputs."""
+    simulation = Simulation(difficulty, seed, entity_store)
+    recorder = Recorder(simulation)
+    policy = policies[policy]
+    state = simulation.state()
+    while not state.game_over and state.frame < max_frames:
+        state = recorder.step(policy(simulation))
+    recorder.save(path)
+    return state
+
+
+def watch(log):
+    """Replays log at normal speed in a window."""
+    from render import Renderer
+    from starfield import StarField
+    from assets import images
+    from settings import window
+    surface = pygame.display.set_mode(window)
+    images.preload()
+    renderer = Renderer(surface, StarField())
+    renderer.reset()
+    clock = pygame.time.Clock()
+
+    def draw(simulation):
+        renderer.draw(*simulation.drawables())
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                sys.exit()
+        clock.tick(60)
+    return replay(log, draw)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Record and replay games.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    rec = commands.add_parser('record', help='record a scripted session')
+    rec.add_argument('path')
+    rec.add_argument('-d', '--difficulty', default='EASY')
+    rec.add_argument('-s', '--seed', type=int, default=None)
+    rec.add_argument('-p', '--policy', default='dodge',
+                     choices=sorted(policies))
+    rec.add_argument('-f', '--max-frames', type=int, default=36000)
+    rec.add_argument('-e', '--entity-store', action='store_true',
+                     help='keep beams in an EntityStore')
+    play = commands.add_parser('play', help='fast forward or watch a log')
+    play.add_argument('path')
+    play.add_argument('-w', '--watch', action='store_true',
+                      help='show the game at normal speed')
+    args = parser.parse_args()
+
+    if args.command == 'record':
+        os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+        state = record(args.path, args.difficulty, args.seed, args.policy,
+                       args.max_frames, args.entity_store)
+        print(state, '{} bytes'.format(os.path.getsize(args.path)))
+        return
+
+    log = load(args.path)
+    if args.watch:
+        simulation = watch(log)
+    else:
+        os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+        start = time.perf_counter()
+        simulation = replay(log)
+        elapsed = time.perf_counter() - start
+        print('{} frames in {:.2f} s, {:.0f} frames/s'.format(
+            log.frames, elapsed, log.frames / elapsed))
+    print(simulation.state())
+    if simulation.frame != log.frames or simulation.digest() != log.digest:
+        sys.exit('replay diverged from the recorded game')
+    print('replay matches the recorded game')
+
+if __name__ == '__main__':
+    main()
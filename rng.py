@@ -0,0 +1,12 @@
+import math
+
+
+def geometric_delay(rng, period):
+    """
+    Frames until an event that happens with chance 1 / period a frame.
+
+    Same distribution as rolling every frame, at least 1.
+    """
+    if period <= 1:
+        return 1
+    return 1 + int(math.log1p(-rng.random()) / math.log1p(-1.0 / period))
@@ -5,3 +5,21 @@ WidthHeight = collections.namedtuple('WidthHeight', 'width height')
 window = WidthHeight(width=1024, height=480)
 object_size = WidthHeight(width=80, height=60)
 HIGHSCORE = 'highscore'
+ATLAS = 'atlas.json'
+HIGHSCORE_FILE = 'highscores.json'
+HIGHSCORE_SIZE = 10
+PLAYER_NAME = 'PLAYER'
+FULL_FLIP = False
+REPLAY_FILE = None
+PROFILE = False
+PROFILE_TRACE = None
+ENTITY_STORE = False
+WAVES = 'waves.json'
+TARGET_FPS = 60
+VSYNC = False
+MAX_TICKS_PER_FRAME = 5
+INTERPOLATE = True
+PIPELINE = False
+SERVER = None
+WARM_CACHES_IN_BACKGROUND = True
+STARTUP_TIMING = False
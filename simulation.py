@@ -0,0 +1,387 @@
+import os
+import sys
+import time
+import zlib
+import random
+import collections
+import pygame
+import pool
+import collision
+from collision import GridGroup, collide_mask
+from entities import EntityStore
+from render import BatchedRenderUpdates
+from game_objects import *
+from profiler import NullProfiler
+from waves import WaveEngine
+
+FPS = 60
+
+Inputs = collections.namedtuple('Inputs', 'left_right up_down firing')
+# stands in for a sprite when only its rect is needed
+Hit = collections.namedtuple('Hit', 'rect')
+State = collections.namedtuple(
+    'State', 'frame score level kills bonuses game_over')
+
+IDLE = Inputs(0, 0, 0)
+
+
+class Simulation:
+    """
+    One game session advanced on a fixed timestep.
+
+    step(inputs) -> State runs one tick of the game rules: level
+    progression, spawning, player, enemy shots, collisions and sprite
+    updates. Nothing is drawn, sprites are left in all for whoever wants
+    to render them. Game objects keep their groups and factory state on
+    classes, so only one simulation can be played at a time in a process
+    and creating a new one resets that state.
+
+    All game randomness comes from rng seeded with seed, so the same seed
+    and the same inputs always give the same game. Policies draw from
+    their own policy_rng and don't disturb it.
+
+    With entity_store beams are kept in an EntityStore instead of sprite
+    groups, which follows the same rules but scales to far more beams.
+
+    Several players share the game, the score and the difficulty. Each
+    of them fires its own beams up to its own limit, and the game is
+    over when the last one is destroyed. player is the first of them.
+    """
+    beam_speed = 8
+
+    def __init__(self, difficulty='EASY', seed=None, entity_store=False,
+                 players=1):
+        if seed is None:
+            seed = random.randrange(2**32)
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.policy_rng = random.Random('policy {}'.format(seed))
+        self.profiler = NullProfiler()
+
+        self.all = BatchedRenderUpdates()
+        self.enemy_beams = GridGroup()
+        self.player_beams = GridGroup()
+        self.enemies = GridGroup()
+        self.bonuses = GridGroup()
+
+        # assign default groups to each sprite class
+        EnemyFactory._Enemy.containers = self.all, self.enemies
+        BonusFactory._Bonus.containers = self.all, self.bonuses
+        PlayerBeam.containers = self.all, self.player_beams
+        EnemyBeam.containers = self.all, self.enemy_beams
+        Player.containers = self.all
+        Explosion.containers = self.all
+
+        if not Explosion.images:
+            Explosion.images = images.frames('explosion')
+
+        self.projectiles = None
+        EnemyFactory.fire = EnemyBeam.create
+        if entity_store:
+            self.projectiles = EntityStore()
+            image = images.get('normal_beam.gif')
+            self.player_beam = self.projectiles.add_kind(image)
+            self.enemy_beam = self.projectiles.add_kind(image)
+            # beams of every other player are a kind of their own
+            self.beam_kinds = [self.player_beam] + [
+                self.projectiles.add_kind(image) for i in range(players - 1)]
+            EnemyFactory.fire = self.fire_enemy_beam
+
+        EnemyFactory.reset()
+        EnemyFactory.rng = BonusFactory.rng = self.rng
+        EnemyFactory.change_enemy_strategy(difficulty)
+        self.waves = WaveEngine(self.rng)
+        self.level_frames = self.waves.level_frames
+        self.players = [Player((0, window.height * i // players))
+                        for i in range(players)]
+        self.alive = [True] * players
+
+        self.difficulty = difficulty
+        self.frame = 0
+        self.score = 0
+        self.level = 1
+        self.kills = 0
+        self.bonuses_taken = 0
+        self.game_over = False
+
+    @property
+    def player(self):
+        return self.players[0]
+
+    def state(self):
+        return State(self.frame, self.score, self.level, self.kills,
+                     self.bonuses_taken, self.game_over)
+
+    def digest(self):
+        """Checksum of state and positions of all sprites."""
+        values = list(self.state())
+        for i in self.all:
+            values.extend(i.rect)
+        store = self.projectiles
+        if store is not None:
+            for name in 'x', 'y', 'kind':
+                values.extend(getattr(store, name)[:store.count].tolist())
+            # written as 0 and 1 so digests of older replays still match
+            values.extend(store.alive[:store.count].astype(int).tolist())
+        return zlib.crc32(repr(values).encode())
+
+    def step(self, *inputs):
+        """
+        Advances the game by one frame and returns its state.
+
+        inputs are given in the order of players, players without
+        inputs (or destroyed ones) don't move.
+        """
+        if self.game_over:
+            return self.state()
+        self.frame += 1
+        # level goes up every level_frames of the wave definitions
+        if self.frame % self.level_frames == 0:
+            self.level += 1
+
+        profiler = self.profiler
+        profiler.mark('level')
+        self.create_enemy()
+        self.create_bonus()
+        profiler.mark('spawn')
+        for index in range(len(self.players)):
+            if self.alive[index]:
+                self.move_player(index, *(inputs[index] if index < len(inputs)
+                                          else IDLE))
+        profiler.mark('input')
+        EnemyFactory.scheduler.tick()
+        profiler.mark('shot')
+        self.collide()
+        self.all.update()
+        if self.projectiles is not None:
+            self.projectiles.update()
+        profiler.mark('update')
+        return self.state()
+
+    def run(self, policy, max_frames=None):
+        """Steps as fast as possible until game over or max_frames."""
+        state = self.state()
+        while not state.game_over and \
+              (max_frames is None or state.frame < max_frames):
+            state = self.step(policy(self))
+        return state
+
+    def counts(self):
+        """Number of sprites in each group."""
+        return {'sprites': len(self.all), 'enemies': len(self.enemies),
+                'player_beams': self.count_player_beams(),
+                'enemy_beams': self.count_enemy_beams(),
+                'bonuses': len(self.bonuses)}
+
+    def count_player_beams(self, owner=None):
+        """Beams of all players, or only the ones owner fired."""
+        if self.projectiles is None:
+            if owner is None or len(self.players) == 1:
+                return len(self.player_beams)
+            return sum(1 for i in self.player_beams if i.owner == owner)
+        if owner is None:
+            return sum(self.projectiles.count_kind(kind)
+                       for kind in self.beam_kinds)
+        return self.projectiles.count_kind(self.beam_kinds[owner])
+
+    def count_enemy_beams(self):
+        if self.projectiles is None:
+            return len(self.enemy_beams)
+        return self.projectiles.count_kind(self.enemy_beam)
+
+    def drawables(self):
+        """Groups (and stores) that make up a frame of the game."""
+        if self.projectiles is None:
+            return (self.all,)
+        return (self.all, self.projectiles)
+
+    def end(self):
+        """Removes every sprite of the session."""
+        for i in self.all:
+            i.kill()
+        EnemyFactory.scheduler.clear()
+        if self.projectiles is not None:
+            self.projectiles.empty()
+
+    def fire_beam(self, kind, pos, direction=1):
+        """Puts a beam into the entity store, like Beam does."""
+        image = self.projectiles.images[kind]
+        self.projectiles.spawn(kind, image.get_rect(midright=pos),
+                               self.beam_speed * direction)
+
+    def fire_enemy_beam(self, pos, direction=-1):
+        self.fire_beam(self.enemy_beam, pos, direction)
+
+    def create_enemy(self):
+        self.waves.update(self.frame, self.level)
+
+    def create_bonus(self):
+        BonusFactory.create_bonus()
+
+    def move_player(self, index, left_right, up_down, firing):
+        player = self.players[index]
+        if not player.reloading and firing and \
+           player.beam_limit > self.count_player_beams(index):
+            if self.projectiles is None:
+                PlayerBeam.create(player.beam_pos(), index)
+            else:
+                self.fire_beam(self.beam_kinds[index], player.beam_pos())
+        player.reloading = firing
+        self.players[index] = player.move(left_right, up_down)
+
+    def collide(self):
+        players = self.players
+        profiler = self.profiler
+        for group in self.enemies, self.player_beams, self.enemy_beams, \
+                     self.bonuses:
+            group.refresh()
+        profiler.mark('grid')
+        # players destroyed in this frame collide until the frame ends
+        living = [i for i, alive in enumerate(self.alive) if alive]
+
+        for index in living:
+            for alien in collision.spritecollide(players[index], self.enemies,
+                                                 1, collide_mask):
+                Explosion.create(alien)
+                self.hit_player(index)
+                self.score += alien.score
+                self.kills += 1
+        profiler.mark('collide_player_enemies')
+
+        for alien, owners in self.shot_enemies().items():
+            power = sum(players[i].beam_power for i in owners)
+            if alien.health - power <= 0:
+                alien.kill()
+                Explosion.create(alien)
+                self.score += alien.score
+                self.kills += 1
+            alien.health -= power
+        profiler.mark('collide_beams_enemies')
+
+        for index in living:
+            for enemy_beam in self.enemy_beams_hitting(players[index]):
+                Explosion.create(enemy_beam)
+                self.hit_player(index)
+        profiler.mark('collide_player_beams')
+
+        for index in living:
+            for bonus in collision.spritecollide(players[index], self.bonuses,
+                                                 1, collide_mask):
+                players[index] = bonus.upgrade(players[index])
+                self.score += 1
+                self.bonuses_taken += 1
+        profiler.mark('collide_bonuses')
+
+    def shot_enemies(self):
+        """
+        Enemies hit by player beams with owners of the beams.
+
+        The beams are destroyed, every owner hurts the enemy once.
+        """
+        if self.projectiles is None:
+            shot = collision.groupcollide(
+                self.enemies, self.player_beams, 0, 1, collide_mask)
+            return {alien: {beam.owner for beam in beams}
+                    for alien, beams in shot.items()}
+        store = self.projectiles
+        shot = {}
+        kinds = [(owner, kind) for owner, kind in enumerate(self.beam_kinds)
+                 if store.count_kind(kind)]
+        if not kinds:
+            return shot
+        for alien in self.enemies.sprites():
+            for owner, kind in kinds:
+                hits = self.touching(alien, store.collide(alien.rect, kind))
+                if hits:
+                    store.kill(hits)
+                    shot.setdefault(alien, set()).add(owner)
+        return shot
+
+    def enemy_beams_hitting(self, player):
+        """Enemy beams that hit player, the beams are destroyed."""
+        if self.projectiles is None:
+            return collision.spritecollide(player, self.enemy_beams, 1,
+                                           collide_mask)
+        store = self.projectiles
+        hits = self.touching(player, store.collide(player.rect,
+                                                   self.enemy_beam))
+        beams = [Hit(store.rect(i)) for i in hits]
+        store.kill(hits)
+        return beams
+
+    def touching(self, sprite, hits):
+        """Indices of entities overlapping sprite that touch its mask."""
+        rect = self.projectiles.rect
+        return [i for i in hits.tolist() if collide_mask(sprite, Hit(rect(i)))]
+
+    def hit_player(self, index):
+        """
+        Destroys player at index unless it's indestructable.
+
+        The game is over once every player is destroyed.
+        """
+        player = self.players[index]
+        if not isinstance(player, Indestructable):
+            if self.alive[index]:
+                Explosion.create(player)
+            self.alive[index] = False
+            self.game_over = not any(self.alive)
+        player.destroy()
+
+
+def idle_policy(simulation):
+    return IDLE
+
+
+def random_policy(simulation):
+    """Wanders around and shoots all the time."""
+    rng = simulation.policy_rng
+    return Inputs(rng.randint(-1, 1), rng.randint(-1, 1),
+                  simulation.frame % 2)
+
+
+def dodge_policy(simulation):
+    """Shoots all the time and leaves rows that something is flying into."""
+    rect = simulation.player.rect
+    threatened = False
+    for group in simulation.enemies, simulation.enemy_beams:
+        for i in group:
+            if i.rect.left >= rect.left and i.rect.top < rect.bottom and \
+               i.rect.bottom > rect.top:
+                threatened = True
+                break
+    up_down = 0
+    if threatened:
+        up_down = 1 if rect.centery < window.height // 2 else -1
+    return Inputs(0, up_down, simulation.frame % 2)
+
+
+policies = {
+    'idle': idle_policy,
+    'random': random_policy,
+    'dodge': dodge_policy,
+}
+
+
+def main():
+    """Runs headless sessions, arguments: frames difficulty."""
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    frames = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    difficulty = sys.argv[2] if len(sys.argv) > 2 else 'EASY'
+    pygame.display.init()
+    done = 0
+    start = time.perf_counter()
+    while done < frames:
+        simulation = Simulation(difficulty)
+        state = simulation.run(random_policy, frames - done)
+        simulation.end()
+        done += state.frame
+        print(state)
+    elapsed = time.perf_counter() - start
+    print('{} frames in {:.2f} s, {:.0f} frames/s'.format(
+        done, elapsed, done / elapsed))
+    for name, stats in sorted(pool.stats().items()):
+        print(name, stats)
+
+if __name__ == '__main__':
+    main()
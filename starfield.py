@@ -1,53 +1,105 @@
 #!/usr/bin/env python
 
-import random, math, pygame
+import sys
+import numpy
+import pygame
 from pygame.locals import *
 from settings import window
 
 #constants
 NUMSTARS = 200
+LAYERS = 1
 STAR_COLOR = 255, 240, 200
 SKY_COLOR = 20, 20, 40
 
 
-def init_star():
-    """Creates new star values."""
-    dir = -random.random()
-    velmult = 20
-    vel = [dir * velmult, 0]
-    return vel, [window.width, random.randrange(window.height)]
-
-
-def initialize_stars():
-    """Creates a new starfield."""
-    stars = []
-    for x in range(NUMSTARS):
-        star = init_star()
-        stars.append(star)
-    move_stars(stars)
-    return stars
-
-
-def draw_stars(surface, stars, color):
-    """Used to draw (and clear) the stars."""
-    for vel, pos in stars:
-        pos = (int(pos[0]), int(pos[1]))
-        surface.set_at(pos, color)
+class StarField:
+    """
+    Starfield that keeps all stars in NumPy arrays.
 
+    Stars are moved, respawned and drawn in batch, so the cost of a frame
+    barely depends on the number of stars. With more than one layer
+    stars are split into parallax layers, far layers are slower and
+    dimmer than near ones.
+    """
+    velmult = 20
 
-def move_stars(stars):
-    """Animate the star values."""
-    for vel, pos in stars:
-        pos[0] = pos[0] + vel[0]
-        pos[1] = pos[1] + vel[1]
-        if not 0 <= pos[0] <= window.width:
-            vel[:], pos[:] = init_star()
+    def __init__(self, numstars=NUMSTARS, layers=LAYERS, seed=None):
+        self.rng = numpy.random.default_rng(seed)
+        self.layer = numpy.arange(numstars) % layers
+        # near layer (layers - 1) keeps full speed and full brightness
+        depth = numpy.arange(1, layers + 1) / layers
+        self.speed = (depth * self.velmult)[self.layer]
+        self.brightness = 0.4 + 0.6 * depth
+        self.x = numpy.empty(numstars)
+        self.y = numpy.empty(numstars, dtype=numpy.intp)
+        self.vel = numpy.empty(numstars)
+        self.drawn = None
+        self.colors = {}
+        self.respawn(numpy.ones(numstars, dtype=bool))
+        self.move()
+
+    def __len__(self):
+        return len(self.x)
+
+    def respawn(self, mask):
+        """Puts selected stars back on the right edge with new values."""
+        count = int(numpy.count_nonzero(mask))
+        if not count:
+            return
+        self.vel[mask] = -self.rng.random(count) * self.speed[mask]
+        self.x[mask] = window.width
+        self.y[mask] = self.rng.integers(0, window.height, count)
+
+    def move(self, steps=1.0):
+        """Animate the star values, steps is time in frames of 1/60 s."""
+        self.x += self.vel * steps
+        self.respawn((self.x < 0) | (self.x > window.width))
+
+    def draw(self, surface, color=STAR_COLOR):
+        """Draws stars and remembers where, so they can be erased."""
+        xs = self.x.astype(numpy.intp)
+        visible = xs < surface.get_width()
+        xs, ys = xs[visible], self.y[visible]
+        self._put(surface, xs, ys, self._layer_colors(surface, color)[
+            self.layer[visible]])
+        self.drawn = xs, ys
+
+    def erase(self, surface, color=SKY_COLOR):
+        """Paints last drawn stars with background color."""
+        if self.drawn is None:
+            return
+        xs, ys = self.drawn
+        self._put(surface, xs, ys, surface.map_rgb(color))
+        self.drawn = None
+
+    def _layer_colors(self, surface, color):
+        """Mapped pixel value for every layer, cached per surface format."""
+        key = (color, surface.get_bitsize(), surface.get_masks())
+        colors = self.colors.get(key)
+        if colors is None:
+            colors = numpy.array([surface.map_rgb(
+                [int(c * b) for c in color]) for b in self.brightness])
+            self.colors[key] = colors
+        return colors
+
+    def _put(self, surface, xs, ys, values):
+        try:
+            pixels = pygame.surfarray.pixels2d(surface)
+        except ValueError:
+            # 24 bit surfaces have no 2d view
+            values = numpy.broadcast_to(values, xs.shape)
+            for x, y, value in zip(xs, ys, values):
+                surface.set_at((x, y), surface.unmap_rgb(int(value)))
+            return
+        pixels[xs, ys] = values
+        del pixels
 
 
 def test():
-    """Test for starfield."""
-    random.seed()
-    stars = initialize_stars()
+    """Test for starfield, optional arguments: numstars layers."""
+    args = [int(i) for i in sys.argv[1:3]]
+    stars = StarField(*args)
     clock = pygame.time.Clock()
     #initialize and prepare screen
     pygame.init()
@@ -57,17 +109,17 @@ def test():
 
     done = 0
     while not done:
-        draw_stars(screen, stars, SKY_COLOR)
-        move_stars(stars)
-        draw_stars(screen, stars, STAR_COLOR)
+        stars.erase(screen)
+        stars.move()
+        stars.draw(screen)
         pygame.display.update()
         for e in pygame.event.get():
             if e.type == QUIT or (e.type == KEYUP and e.key == K_ESCAPE):
                 done = 1
                 break
         clock.tick(50)
+        pygame.display.set_caption('Starfield test {:.0f} FPS'.format(
+            clock.get_fps()))
 
 if __name__ == '__main__':
     test()
-
-
@@ -0,0 +1,17 @@
+import os
+import sys
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pygame
+import pytest
+
+
+@pytest.fixture(scope='session', autouse=True)
+def display():
+    """Headless display, images are converted like in the game."""
+    pygame.display.init()
+    pygame.display.set_mode((1, 1))
+    yield
+    pygame.display.quit()
@@ -0,0 +1,51 @@
+import json
+import random
+import pygame
+import atlas
+from assets import ImageCache
+
+
+def test_pack_places_rectangles_without_overlap():
+    rng = random.Random(1)
+    sizes = [(rng.randint(1, 90), rng.randint(1, 70)) for i in range(40)]
+    width, height, positions = atlas.pack(sizes)
+    assert width & (width - 1) == 0
+    rects = [pygame.Rect(position, size)
+             for position, size in zip(positions, sizes)]
+    for i, rect in enumerate(rects):
+        assert rect.left >= 0 and rect.top >= 0
+        assert rect.right <= width and rect.bottom <= height
+        assert rect.collidelist(rects[i + 1:]) == -1
+
+
+def test_build_keeps_visible_pixels():
+    images = {}
+    for name, color in ('red', (255, 0, 0)), ('green', (0, 255, 0)):
+        image = pygame.Surface((10, 8))
+        image.fill((255, 0, 138))
+        image.fill(color, (2, 2, 4, 4))
+        image.set_colorkey((255, 0, 138))
+        images[name] = image
+    sheet, index = atlas.build(images)
+    sheet.set_colorkey(index['colorkey'])
+    for name, image in images.items():
+        x, y, w, h = index['sprites'][name]
+        sprite = sheet.subsurface((x, y, w, h))
+        assert pygame.mask.from_surface(sprite).count() == 16
+        assert sprite.get_at((3, 3)) == image.get_at((3, 3))
+
+
+def test_cache_takes_animation_frames_from_the_index(tmp_path):
+    images = {}
+    for name, color in ('red', (255, 0, 0)), ('green', (0, 255, 0)):
+        images[name] = pygame.Surface((6, 6))
+        images[name].fill(color)
+    sheet, index = atlas.build(images)
+    index['image'] = 'sheet.png'
+    index['animations'] = {'blink': ['red', 'green', 'red']}
+    pygame.image.save(sheet, str(tmp_path / 'sheet.png'))
+    with open(str(tmp_path / 'sheet.json'), 'w') as f:
+        json.dump(index, f)
+    frames = ImageCache(str(tmp_path), 'sheet.json').frames('blink')
+    assert [frame.get_at((3, 3))[:3] for frame in frames] == \
+        [(255, 0, 0), (0, 255, 0), (255, 0, 0)]
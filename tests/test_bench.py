@@ -0,0 +1,51 @@
+import platform
+import bench
+
+NAMES = ['a', 'b', 'c', 'd']
+
+
+def stats(speed):
+    return bench.Stats(ops_per_sec=speed, p50=1.0, p99=2.0, ops=100)
+
+
+def baseline(speed=1000.0):
+    return {name: stats(speed)._asdict() for name in NAMES}
+
+
+def results(speeds):
+    return {name: stats(speed) for name, speed in zip(NAMES, speeds)}
+
+
+def test_noise_within_tolerance_passes():
+    assert bench.compare(results([1000, 900, 1100, 850]), baseline(),
+                         0.25) == []
+
+
+def test_one_slower_scenario_regresses():
+    assert bench.compare(results([1000, 1000, 1000, 500]), baseline(),
+                         0.25) == ['d']
+
+
+def test_slowdown_of_every_scenario_regresses():
+    assert bench.compare(results([500] * 4), baseline(), 0.25) == NAMES
+
+
+def test_other_machine_is_compared_to_the_median():
+    assert bench.compare(results([500] * 4), baseline(), 0.25,
+                         relative=True) == []
+    assert bench.compare(results([2000, 2000, 2000, 1200]), baseline(),
+                         0.25, relative=True) == ['d']
+
+
+def test_scenarios_without_baseline_are_skipped():
+    assert bench.compare({'new': stats(1)}, baseline(), 0.25) == []
+
+
+def test_measure_runs_at_least_min_ops():
+    calls = []
+    measured = bench.measure(lambda: calls.append(1), seconds=0, min_ops=7)
+    assert measured.ops == len(calls) == 7
+
+
+def test_machine_leaves_out_the_host_name():
+    assert platform.node() not in bench.machine().split()
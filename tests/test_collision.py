@@ -0,0 +1,92 @@
+import random
+import pygame
+import collision
+from collision import GridGroup
+
+CELL = GridGroup.cell_width, GridGroup.cell_height
+
+
+class Box(pygame.sprite.Sprite):
+
+    def __init__(self, rect, mask=None):
+        pygame.sprite.Sprite.__init__(self)
+        self.rect = pygame.Rect(rect)
+        if mask is not None:
+            self.mask = mask
+
+
+def random_rect(rng):
+    size = rng.randint(1, 2 * CELL[0]), rng.randint(1, 2 * CELL[1])
+    if rng.random() < 0.5:
+        # just across a cell border
+        x = rng.randint(-3, 12) * CELL[0] - rng.randint(1, size[0])
+        y = rng.randint(-3, 8) * CELL[1] - rng.randint(1, size[1])
+    else:
+        x = rng.randint(-CELL[0], 12 * CELL[0])
+        y = rng.randint(-CELL[1], 8 * CELL[1])
+    return pygame.Rect((x, y), size)
+
+
+def random_mask(rng, size):
+    mask = pygame.Mask(size)
+    for i in range(size[0] * size[1] // 3):
+        mask.set_at((rng.randrange(size[0]), rng.randrange(size[1])))
+    return mask
+
+
+def boxes(rng, count, masks=False):
+    rects = [random_rect(rng) for i in range(count)]
+    return [Box(rect, random_mask(rng, rect.size) if masks else None)
+            for rect in rects]
+
+
+def test_spritecollide_matches_pygame():
+    rng = random.Random(1)
+    for layout in range(20):
+        grid = GridGroup(boxes(rng, 60))
+        plain = pygame.sprite.Group(grid.sprites())
+        for frame in range(3):
+            grid.refresh()
+            for sprite in boxes(rng, 30):
+                assert collision.spritecollide(sprite, grid, 0) == \
+                    pygame.sprite.spritecollide(sprite, plain, 0)
+            for sprite in grid:
+                sprite.rect.move_ip(rng.randint(-40, 40),
+                                    rng.randint(-40, 40))
+
+
+def test_masks_match_pygame_collide_mask():
+    rng = random.Random(2)
+    for layout in range(10):
+        grid = GridGroup(boxes(rng, 40, masks=True))
+        plain = pygame.sprite.Group(grid.sprites())
+        grid.refresh()
+        for sprite in boxes(rng, 30, masks=True):
+            assert collision.spritecollide(
+                sprite, grid, 0, collision.collide_mask) == \
+                pygame.sprite.spritecollide(sprite, plain, 0,
+                                            pygame.sprite.collide_mask)
+
+
+def test_groupcollide_matches_pygame_and_kills():
+    rng = random.Random(3)
+    for layout in range(10):
+        left = boxes(rng, 40)
+        right = boxes(rng, 40)
+        copies = [Box(i.rect) for i in left], [Box(i.rect) for i in right]
+        expected = pygame.sprite.groupcollide(
+            pygame.sprite.Group(copies[0]), pygame.sprite.Group(copies[1]),
+            0, 1)
+        grid = GridGroup(right)
+        grid.refresh()
+        crashed = collision.groupcollide(pygame.sprite.Group(left), grid,
+                                         0, 1)
+        index = {i: n for n, i in enumerate(left + right)}
+        copy_index = {i: n for n, i in enumerate(copies[0] + copies[1])}
+        assert {index[i]: [index[j] for j in hit]
+                for i, hit in crashed.items()} == \
+            {copy_index[i]: [copy_index[j] for j in hit]
+             for i, hit in expected.items()}
+        # killed sprites left the grid as well
+        assert set(grid) == {i for i in right if i.alive()}
+        assert {i for cell in grid.cells.values() for i in cell} <= set(grid)
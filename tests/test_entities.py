@@ -0,0 +1,33 @@
+import pygame
+from entities import EntityStore
+from settings import window
+
+
+def test_update_moves_and_culls():
+    store = EntityStore(capacity=2)
+    image = pygame.Surface((20, 5))
+    kind = store.add_kind(image)
+    store.spawn(kind, pygame.Rect(100, 10, 20, 5), 8)
+    store.spawn(kind, pygame.Rect(window.width - 4, 20, 20, 5), 8)
+    store.spawn(kind, pygame.Rect(2, 30, 20, 5), -30)
+    assert len(store) == 3
+    store.update()
+    assert len(store) == 1
+    assert store.rect(0) == pygame.Rect(108, 10, 20, 5)
+
+
+def test_killed_entities_stop_colliding_and_go_away():
+    store = EntityStore()
+    image = pygame.Surface((20, 5))
+    beam, other = store.add_kind(image), store.add_kind(image)
+    for x in 100, 110, 300:
+        store.spawn(beam, pygame.Rect(x, 50, 20, 5), 0)
+    store.spawn(other, pygame.Rect(105, 50, 20, 5), 0)
+    target = pygame.Rect(100, 40, 30, 30)
+    assert store.collide(target).tolist() == [0, 1, 3]
+    assert store.collide(target, beam).tolist() == [0, 1]
+    store.kill([0])
+    assert store.collide(target, beam).tolist() == [1]
+    assert store.count_kind(beam) == 2
+    store.update()
+    assert len(store) == 3
@@ -0,0 +1,70 @@
+import random
+import pytest
+from game_objects import EnemyFactory, FireScheduler
+from simulation import Simulation
+
+
+class Shooter:
+    """Stands in for an enemy that never dies."""
+
+    def __init__(self):
+        self.shots = 0
+
+    def alive(self):
+        return True
+
+    def _fire(self):
+        self.shots += 1
+
+
+@pytest.mark.parametrize('difficulty', sorted(FireScheduler.periods))
+def test_enemies_shoot_once_per_period(monkeypatch, difficulty):
+    monkeypatch.setattr(EnemyFactory, 'rng', random.Random(1))
+    period = FireScheduler.periods[difficulty]
+    scheduler = FireScheduler(period)
+    enemies = [Shooter() for i in range(50)]
+    for enemy in enemies:
+        scheduler.schedule(enemy)
+    frames = 100 * period
+    for frame in range(frames):
+        scheduler.tick()
+    rate = sum(enemy.shots for enemy in enemies) / (len(enemies) * frames)
+    assert 0.9 / period < rate < 1.1 / period
+
+
+@pytest.fixture
+def shots(monkeypatch):
+    """Enemy shots of a fresh game, where every enemy shoots every frame."""
+    simulation = Simulation('HARD', seed=1)
+    simulation.player.kill()
+    fired = []
+    monkeypatch.setattr(EnemyFactory, 'fire',
+                        lambda pos, direction=-1: fired.append(pos))
+    monkeypatch.setattr(EnemyFactory.scheduler, 'period', 1)
+    yield fired
+    simulation.end()
+
+
+def test_killed_enemy_stops_shooting(shots):
+    enemy = EnemyFactory._Enemy.create('basic_enemy', (500, 100), 1)
+    EnemyFactory.scheduler.tick()
+    assert len(shots) == 1
+    enemy.kill()
+    for frame in range(5):
+        EnemyFactory.scheduler.tick()
+    assert len(shots) == 1
+    assert not EnemyFactory.scheduler.heap
+
+
+def test_reused_enemy_drops_its_old_shot(shots):
+    enemy = EnemyFactory._Enemy.create('basic_enemy', (500, 100), 1)
+    enemy.kill()
+    again = EnemyFactory._Enemy.create('basic_enemy', (500, 200), 1)
+    assert again is enemy
+    # the entry of the first life is still queued, only one shot comes
+    assert len(EnemyFactory.scheduler.heap) == 2
+    EnemyFactory.scheduler.tick()
+    assert len(shots) == 1
+    for frame in range(5):
+        EnemyFactory.scheduler.tick()
+    assert len(shots) == 6
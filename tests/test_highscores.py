@@ -0,0 +1,48 @@
+import os
+import json
+from highscores import HighscoreStore, Entry
+
+
+def test_submit_ranks_and_keeps_best(tmp_path):
+    store = HighscoreStore(str(tmp_path / 'scores.json'), size=3, delay=0)
+    assert store.submit(10, 'a', ['easy']) == [0]
+    assert store.submit(30, 'b', ['easy']) == [0]
+    assert store.submit(20, 'c', ['easy', 'hard']) == [1, 0]
+    assert store.submit(5, 'd', ['easy']) == [None]
+    assert store.top('easy') == [Entry(30, 'b'), Entry(20, 'c'),
+                                 Entry(10, 'a')]
+    assert store.scores('easy') == [10, 20, 30]
+    store.close()
+
+
+def test_write_is_complete_and_leaves_no_temporary_files(tmp_path):
+    path = tmp_path / 'scores.json'
+    store = HighscoreStore(str(path), delay=0)
+    store.submit(42, 'p', ['easy'])
+    store.flush()
+    assert json.loads(path.read_text()) == {'easy': [[42, 'p']]}
+    store.close()
+    assert os.listdir(str(tmp_path)) == ['scores.json']
+    assert HighscoreStore(str(path)).top('easy') == [Entry(42, 'p')]
+
+
+def test_failed_write_keeps_old_file(tmp_path, monkeypatch):
+    path = tmp_path / 'scores.json'
+    path.write_text('{"easy": [[1, "old"]]}')
+    store = HighscoreStore(str(path), delay=0)
+
+    def fail(source, destination):
+        raise OSError('disk full')
+    monkeypatch.setattr(os, 'replace', fail)
+    store.submit(99, 'new', ['easy'])
+    store.flush()
+    store.close()
+    assert isinstance(store.error, OSError)
+    assert json.loads(path.read_text()) == {'easy': [[1, 'old']]}
+    assert os.listdir(str(tmp_path)) == ['scores.json']
+
+
+def test_imports_legacy_board(tmp_path):
+    (tmp_path / 'easy.txt').write_text('5\n40\n7\n')
+    store = HighscoreStore(str(tmp_path / 'scores.json'), size=2)
+    assert store.top('easy') == [Entry(40, ''), Entry(7, '')]
@@ -0,0 +1,102 @@
+import random
+import pytest
+import net
+from simulation import Simulation, State, random_policy
+
+STATE = State(7, 12, 2, 3, 1, False)
+
+
+def apply(mirror, message):
+    size, = net.LENGTH.unpack_from(message)
+    assert size == len(message) - net.LENGTH.size
+    return mirror.apply(message[net.LENGTH.size:])
+
+
+def entities_of(mirror):
+    return {i: tuple(entity) for i, entity in mirror.entities.items()}
+
+
+def test_delta_round_trip():
+    rng = random.Random(1)
+    mirror = net.Mirror()
+    old = None
+    entities = {}
+    for frame in range(200):
+        entities = dict(entities)
+        for i in list(entities):
+            kind, image, x, y = entities[i]
+            roll = rng.random()
+            if roll < 0.05:
+                del entities[i]
+            elif roll < 0.1:
+                entities[i] = (kind, image, x + rng.randint(-400, 400), y)
+            elif roll < 0.2:
+                entities[i] = (kind, (image + 1) % 4, x, y)
+            elif roll < 0.8:
+                entities[i] = (kind, image, x + rng.randint(-8, 8),
+                               y + rng.randint(-8, 8))
+        for i in range(rng.randint(0, 3)):
+            entities[rng.randrange(1000)] = (rng.randrange(8), 0,
+                                             rng.randint(-100, 1100),
+                                             rng.randint(-100, 500))
+        state = STATE._replace(frame=frame)
+        assert apply(mirror, net.delta(state, old, entities)) == state
+        assert entities_of(mirror) == entities
+        old = entities
+
+
+def test_small_moves_are_smaller_than_full_records():
+    old = {1: (0, 0, 100, 100)}
+    moved = net.delta(STATE, old, {1: (0, 0, 99, 100)})
+    jumped = net.delta(STATE, old, {1: (0, 0, 500, 100)})
+    unchanged = net.delta(STATE, old, old)
+    assert len(unchanged) == net.LENGTH.size + net.HEADER.size
+    assert len(moved) == len(unchanged) + net.MOVED.size
+    assert len(jumped) == len(unchanged) + net.FULL.size
+
+
+def test_encoder_follows_simulation():
+    kinds = net.sprite_kinds()
+    encoder = net.Encoder(kinds)
+    simulation = Simulation('HARD', seed=4, players=2)
+    mirror = net.Mirror()
+    old = None
+    for frame in range(600):
+        state = simulation.step(random_policy(simulation),
+                                random_policy(simulation))
+        entities = encoder.capture(simulation)
+        apply(mirror, net.delta(state, old, entities))
+        old = entities
+        assert len(entities) == len(simulation.all)
+        drawn = sorted((image.get_size(), position)
+                       for image, position in mirror.sprites(
+                           list(kinds.values())))
+        assert drawn == sorted((i.image.get_size(), i.rect.topleft)
+                               for i in simulation.all)
+        if state.game_over:
+            break
+    simulation.end()
+
+
+def test_encoder_skips_ids_still_in_use():
+    encoder = net.Encoder(net.sprite_kinds())
+    simulation = Simulation('HARD', seed=4, players=2)
+    encoder.capture(simulation)
+    # as if the ids had wrapped around onto the players
+    encoder.next_id = min(encoder.ids.values())
+    for frame in range(300):
+        state = simulation.step(random_policy(simulation),
+                                random_policy(simulation))
+        entities = encoder.capture(simulation)
+        assert len(entities) == len(simulation.all)
+        assert encoder.live == set(entities)
+        if state.game_over:
+            break
+    simulation.end()
+
+
+def test_encoder_needs_images_of_every_sprite_kind():
+    kinds = net.sprite_kinds()
+    del kinds['explosion']
+    with pytest.raises(ValueError):
+        net.Encoder(kinds)
@@ -0,0 +1,76 @@
+import pygame
+import pytest
+import pool
+from pool import Pooled, SpritePool
+from game_objects import EnemyFactory
+from simulation import Simulation
+
+
+@pytest.fixture
+def simulation():
+    simulation = Simulation(seed=1)
+    simulation.player.kill()
+    yield simulation
+    simulation.end()
+
+
+def test_killed_enemy_is_reused_with_fresh_state(simulation):
+    enemy = EnemyFactory._Enemy.create('basic_enemy', (500, 100), 1)
+    rect = enemy.rect
+    enemy.health = 0
+    enemy.rect.move_ip(-300, 0)
+    enemy.kill()
+    assert not enemy.alive()
+    again = EnemyFactory._Enemy.create('bulky_enemy', (700, 200), 3)
+    assert again is enemy
+    assert again.rect is rect
+    assert again.rect.topleft == (700, 200)
+    assert again.speed == EnemyFactory._Enemy.speed * 3
+    assert again.health == EnemyFactory._Enemy.health * 3
+    assert again.kind == 'bulky_enemy'
+    assert set(again.groups()) == {simulation.all, simulation.enemies}
+
+
+def test_sprite_is_released_once(simulation):
+    pool = EnemyFactory._Enemy.pool
+    enemy = EnemyFactory._Enemy.create('basic_enemy', (500, 100), 1)
+    free = len(pool.free)
+    enemy.kill()
+    enemy.kill()
+    assert len(pool.free) == free + 1
+
+
+class Dot(Pooled, pygame.sprite.Sprite):
+    pool = SpritePool('Dot', 2)
+    containers = ()
+
+    def reset(self, position):
+        self.rect.topleft = position
+
+
+def test_full_pool_drops_and_empty_pool_builds():
+    Dot.pool.clear()
+    dots = [Dot.create((i, 0)) for i in range(3)]
+    for dot in dots:
+        dot.add(pygame.sprite.Group())
+        dot.kill()
+    stats = Dot.pool.stats()
+    assert stats['released'] == 2 and stats['dropped'] == 1
+    assert Dot.create((5, 5)) in dots[:2]
+    assert Dot.create((6, 6)) in dots[:2]
+    # the pool is exhausted, a new sprite is built
+    built = Dot.create((7, 7))
+    assert built not in dots
+    assert built.rect.topleft == (7, 7)
+    assert Dot.pool.stats()['created'] == 4
+    assert Dot.pool.stats()['reused'] == 2
+    del pool.pools['Dot']
+
+
+def test_pooled_class_needs_reset():
+    class Broken(Pooled, pygame.sprite.Sprite):
+        pool = SpritePool('Broken', 1)
+        containers = ()
+    del pool.pools['Broken']
+    with pytest.raises(TypeError):
+        Broken()
@@ -0,0 +1,35 @@
+import itertools
+import replay
+from simulation import Inputs
+
+
+def test_encode_decode_round_trip():
+    codes = set()
+    for inputs in itertools.product((-1, 0, 1), (-1, 0, 1), (0, 1)):
+        code = replay.encode(Inputs(*inputs))
+        assert 0 <= code < 256
+        assert replay.decode(code) == Inputs(*inputs)
+        codes.add(code)
+    assert len(codes) == 18
+
+
+def test_recorded_game_replays(tmp_path):
+    path = str(tmp_path / 'game.rep')
+    state = replay.record(path, 'HARD', 5, 'random', 900)
+    log = replay.load(path)
+    assert (log.seed, log.difficulty, log.frames) == (5, 'HARD', state.frame)
+    simulation = replay.replay(log)
+    assert simulation.state() == state
+    assert simulation.digest() == log.digest
+    simulation.end()
+
+
+def test_load_rejects_other_files(tmp_path):
+    path = tmp_path / 'other.rep'
+    path.write_bytes(b'\0' * replay.HEADER.size)
+    try:
+        replay.load(str(path))
+    except ValueError:
+        pass
+    else:
+        raise AssertionError('loaded a file that is not a replay')
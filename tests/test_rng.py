@@ -0,0 +1,16 @@
+import random
+from rng import geometric_delay
+
+
+def test_geometric_delay_is_positive_with_mean_period():
+    rng = random.Random(1)
+    delays = [geometric_delay(rng, 50) for i in range(20000)]
+    assert min(delays) >= 1
+    assert 47 < sum(delays) / len(delays) < 53
+    assert geometric_delay(random.Random(2), 1) == 1
+
+
+def test_geometric_delay_is_deterministic():
+    first = [geometric_delay(random.Random(7), 30) for i in range(5)]
+    second = [geometric_delay(random.Random(7), 30) for i in range(5)]
+    assert first == second
@@ -0,0 +1,39 @@
+import pygame
+from entities import EntityStore
+from timestep import FixedTimestep, Interpolator
+
+
+def test_ticks_follow_elapsed_time():
+    timestep = FixedTimestep(rate=60, max_ticks=5)
+    assert timestep.advance(1 / 120.0) == 0
+    assert timestep.advance(1 / 120.0) == 1
+    assert timestep.advance(1.0) == 5
+    assert timestep.dropped == 55
+
+
+def test_store_entities_spawned_by_the_last_tick_stay_put():
+    store = EntityStore()
+    store.spawn(0, pygame.Rect(100, 10, 4, 4), 8)
+    interpolator = Interpolator()
+    interpolator.capture([], store)
+    # the last tick moves the old beam and fires a new one
+    store.spawn(0, pygame.Rect(200, 10, 4, 4), 8)
+    store.update()
+    interpolator.apply([], 0.25, store)
+    assert store.x[:store.count].tolist() == [102, 208]
+    interpolator.restore(store)
+    assert store.x[:store.count].tolist() == [108, 208]
+
+
+def test_new_entities_survive_compaction_unmoved():
+    store = EntityStore()
+    store.spawn(0, pygame.Rect(100, 10, 4, 4), 8)
+    store.spawn(0, pygame.Rect(300, 10, 4, 4), 8)
+    interpolator = Interpolator()
+    interpolator.capture([], store)
+    store.kill([0])
+    store.spawn(0, pygame.Rect(50, 10, 4, 4), 8)
+    store.update()
+    interpolator.apply([], 0.5, store)
+    assert store.x[:store.count].tolist() == [304, 58]
+    interpolator.restore(store)
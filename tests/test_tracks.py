@@ -0,0 +1,41 @@
+import pytest
+from game_objects import EnemyFactory
+from simulation import Simulation
+
+
+@pytest.fixture
+def simulation():
+    simulation = Simulation(seed=1)
+    yield simulation
+    simulation.end()
+
+
+def leave(simulation, enemy, how):
+    if how == 'kill':
+        enemy.kill()
+    elif how == 'remove':
+        for group in enemy.groups():
+            group.remove(enemy)
+    else:
+        for group in enemy.groups():
+            group.empty()
+
+
+@pytest.mark.parametrize('how', ['kill', 'remove', 'empty'])
+def test_enemy_leaving_frees_its_track(simulation, how):
+    track = EnemyFactory.enemy_tracks[2]
+    enemy = EnemyFactory.spawn('basic_enemy', track, 1)
+    assert EnemyFactory.occupied_tracks[track] == 1
+    assert EnemyFactory.spawn('basic_enemy', track, 1) is None
+    leave(simulation, enemy, how)
+    assert not enemy.alive()
+    assert EnemyFactory.occupied_tracks[track] == 0
+    assert EnemyFactory.spawn('basic_enemy', track, 1) is not None
+
+
+def test_track_is_freed_once(simulation):
+    track = EnemyFactory.enemy_tracks[0]
+    enemy = EnemyFactory.spawn('basic_enemy', track, 1)
+    simulation.all.remove(enemy)
+    enemy.kill()
+    assert EnemyFactory.occupied_tracks[track] == 0
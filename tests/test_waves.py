@@ -0,0 +1,56 @@
+import random
+import waves
+from game_objects import EnemyFactory
+
+
+def test_waves_compile_sorted_by_level():
+    level_frames, compiled, growth = waves.load()
+    assert level_frames > 0
+    levels = [wave.level for wave in compiled]
+    assert levels == sorted(levels)
+    for wave in compiled:
+        assert wave.enemies
+        assert all(enemy in EnemyFactory.enemies for enemy in wave.enemies)
+        assert len(wave.enemy_weights) == len(wave.enemies)
+
+
+def test_schedule_stays_in_level_and_lanes():
+    level_frames, compiled, growth = waves.load()
+    lanes = len(EnemyFactory.enemy_tracks)
+    for wave in compiled:
+        spawns = wave.schedule(600, level_frames, random.Random(3), lanes)
+        frames = [spawn.frame for spawn in spawns]
+        assert frames == sorted(frames)
+        # formations may reach past the end of the level
+        assert all(frame >= 600 for frame in frames)
+        assert all(0 <= spawn.lane < lanes for spawn in spawns)
+        again = wave.schedule(600, level_frames, random.Random(3), lanes)
+        assert spawns == again
+
+
+def test_engine_picks_last_wave_at_or_below_level():
+    engine = waves.WaveEngine(random.Random(1))
+    assert engine.wave(1).level == 1
+    assert engine.wave(11).level == 10
+    assert engine.wave(engine.levels[-1]) is engine.waves[-1]
+
+
+def test_levels_past_last_wave_keep_growing():
+    engine = waves.WaveEngine(random.Random(1))
+    last = engine.waves[-1]
+    growth = engine.growth
+    previous = last
+    for level in range(last.level + 1, last.level + 40):
+        wave = engine.wave(level)
+        assert wave.level == level
+        assert growth['min_interval'] <= wave.interval <= previous.interval
+        for enemy, weight in growth['mix'].items():
+            assert wave.mix[enemy] > previous.mix.get(enemy, 0)
+        previous = wave
+    assert previous.interval == growth['min_interval']
+    # the compiled last wave is left as defined
+    assert engine.wave(last.level).mix == last.mix
+    spawns = engine.wave(last.level + 5).schedule(
+        0, engine.level_frames, random.Random(3),
+        len(EnemyFactory.enemy_tracks))
+    assert spawns
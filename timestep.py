@@ -0,0 +1,95 @@
+import numpy
+
+
+class FixedTimestep:
+    """
+    Decides how many fixed ticks of the simulation a frame should run.
+
+    Real time of every frame goes to an accumulator that is spent in
+    ticks of 1 / rate seconds, so the game runs at the same speed at 30,
+    60 or 144 frames per second. When frames take longer than max_ticks
+    ticks, the rest is dropped and the game slows down instead of
+    falling further behind. alpha() tells how far the next tick is,
+    for interpolation.
+    """
+
+    def __init__(self, rate=60, max_ticks=5):
+        self.dt = 1.0 / rate
+        self.max_ticks = max_ticks
+        self.accumulator = 0.0
+        self.dropped = 0
+
+    def reset(self):
+        self.accumulator = 0.0
+
+    def advance(self, elapsed):
+        """Adds elapsed seconds and returns how many ticks are due."""
+        self.accumulator += elapsed
+        ticks = int(self.accumulator / self.dt)
+        if ticks > self.max_ticks:
+            self.dropped += ticks - self.max_ticks
+            ticks = self.max_ticks
+            self.accumulator = 0.0
+        else:
+            self.accumulator -= ticks * self.dt
+        return ticks
+
+    def alpha(self):
+        """Fraction of a tick left in the accumulator, from 0 to 1."""
+        return min(self.accumulator / self.dt, 1.0)
+
+
+class Interpolator:
+    """
+    Draws sprites between their last two simulated positions.
+
+    capture() remembers positions before the last tick of a frame,
+    apply() moves sprites alpha of the way from there to where the tick
+    left them and restore() puts them back before the next tick, so
+    the simulation never sees drawn positions. Sprites spawned by the
+    last tick are drawn where they are, so are sprites that jumped
+    further than max_step (e.g. reused from a pool). Entities of a store
+    are moved back by their speed, except the ones the last tick
+    spawned.
+    """
+    max_step = 64
+
+    def __init__(self):
+        self.previous = {}
+        self.moved = []
+        self.offsets = None
+        self.spawned = 0
+
+    def capture(self, group, store=None):
+        self.previous = {sprite: sprite.rect.topleft for sprite in group}
+        if store is not None:
+            self.spawned = store.spawned
+
+    def apply(self, group, alpha, store=None):
+        previous = self.previous
+        moved = self.moved
+        for sprite in group:
+            old = previous.get(sprite)
+            if old is None:
+                continue
+            rect = sprite.rect
+            x, y = rect.topleft
+            if old != (x, y) and abs(x - old[0]) <= self.max_step and \
+                    abs(y - old[1]) <= self.max_step:
+                moved.append((rect, x, y))
+                rect.topleft = (round(old[0] + (x - old[0]) * alpha),
+                                round(old[1] + (y - old[1]) * alpha))
+        if store is not None and store.count:
+            n = store.count
+            self.offsets = numpy.rint(store.vx[:n] * (alpha - 1.0)).astype(
+                store.x.dtype)
+            self.offsets[store.serial[:n] >= self.spawned] = 0
+            store.x[:n] += self.offsets
+
+    def restore(self, store=None):
+        for rect, x, y in self.moved:
+            rect.topleft = (x, y)
+        del self.moved[:]
+        if self.offsets is not None:
+            store.x[:len(self.offsets)] -= self.offsets
+            self.offsets = None
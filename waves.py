@@ -0,0 +1,163 @@
+import os
+import json
+import copy
+import bisect
+import itertools
+import collections
+from assets import data_dir
+from settings import WAVES
+from rng import geometric_delay
+from game_objects import EnemyFactory
+
+Spawn = collections.namedtuple('Spawn', 'frame enemy lane multiplier')
+
+definitions = {}
+
+
+class Wave:
+    """
+    Level definition compiled for sampling.
+
+    Enemies and formations are drawn by weight, formations start
+    interval frames apart on average. A formation is a list of (frame
+    offset, lane offset) pairs counted from its first enemy.
+    """
+
+    def __init__(self, level, interval, mix, formations, shapes, lanes,
+                 multipliers):
+        self.level = level
+        self.interval = interval
+        self.enemy_multipliers = multipliers
+        self.set_mix(mix)
+        self.formations = [[tuple(i) for i in shapes[name]]
+                           for name in formations]
+        self.formation_weights = list(itertools.accumulate(
+            formations.values()))
+        self.lanes = lanes
+
+    def set_mix(self, mix):
+        self.mix = dict(mix)
+        self.enemies = list(mix)
+        self.enemy_weights = list(itertools.accumulate(mix.values()))
+        self.multipliers = [self.enemy_multipliers[i] for i in self.enemies]
+
+    def extend(self, level, growth):
+        """
+        Wave of a level past this one, which is the last defined.
+
+        Every further level multiplies the interval by growth['interval']
+        down to growth['min_interval'] and adds growth['mix'] to the
+        enemy weights.
+        """
+        steps = level - self.level
+        wave = copy.copy(self)
+        wave.level = level
+        wave.interval = max(growth['min_interval'],
+                            self.interval * growth['interval'] ** steps)
+        mix = dict(self.mix)
+        for enemy, weight in growth['mix'].items():
+            mix[enemy] = mix.get(enemy, 0) + weight * steps
+        wave.set_mix(mix)
+        return wave
+
+    def schedule(self, start, length, rng, lane_count):
+        """Spawns of frames from start to start + length, in order."""
+        spawns = []
+        end = start + length
+        frame = start + geometric_delay(rng, self.interval) - 1
+        while frame < end:
+            i = bisect.bisect(self.enemy_weights,
+                              rng.random() * self.enemy_weights[-1])
+            formation = self.formations[bisect.bisect(
+                self.formation_weights,
+                rng.random() * self.formation_weights[-1])]
+            lane = rng.choice(self.lanes)
+            for offset, lane_offset in formation:
+                if 0 <= lane + lane_offset < lane_count:
+                    spawns.append(Spawn(frame + offset, self.enemies[i],
+                                        lane + lane_offset,
+                                        self.multipliers[i]))
+            frame += geometric_delay(rng, self.interval)
+        spawns.sort(key=lambda spawn: spawn.frame)
+        return spawns
+
+
+def load(path=None):
+    """
+    Level frames, waves of the definitions file sorted by level and
+    growth past the last level (None keeps the last wave).
+
+    Files are read and compiled once per process.
+    """
+    path = path or os.path.join(data_dir, WAVES)
+    if path not in definitions:
+        with open(path) as f:
+            data = json.load(f)
+        lanes = list(range(len(EnemyFactory.enemy_tracks)))
+        waves = []
+        for level in data['levels']:
+            waves.append(Wave(level['level'], level['interval'], level['mix'],
+                              level.get('formations', {'single': 1}),
+                              data['formations'], level.get('lanes', lanes),
+                              data['enemies']))
+        waves.sort(key=lambda wave: wave.level)
+        definitions[path] = (data['level_frames'], waves,
+                             data.get('growth'))
+    return definitions[path]
+
+
+class WaveEngine:
+    """
+    Spawns enemies level by level from precompiled schedules.
+
+    When a level starts its wave (the last one defined for that level or
+    below) is compiled into a time-ordered list of spawns and a cursor
+    walks it, so a frame costs only the spawns that are due. Spawns on
+    a track still covered by an enemy are skipped. Levels past the last
+    wave extend it by the growth of the definitions.
+    """
+
+    def __init__(self, rng, path=None):
+        self.rng = rng
+        self.level_frames, self.waves, self.growth = load(path)
+        self.levels = [wave.level for wave in self.waves]
+        self.level = None
+        self.schedule = []
+        self.cursor = 0
+
+    def wave(self, level):
+        wave = self.waves[max(bisect.bisect(self.levels, level) - 1, 0)]
+        if level > wave.level and wave is self.waves[-1] and self.growth:
+            return wave.extend(level, self.growth)
+        return wave
+
+    def start(self, level, frame):
+        """
+        Compiles spawns of level, which starts at frame.
+
+        Formations that didn't finish in the previous level go on.
+        """
+        self.level = level
+        spawns = self.wave(level).schedule(
+            frame, self.level_frames, self.rng, len(EnemyFactory.enemy_tracks))
+        rest = self.schedule[self.cursor:]
+        if rest:
+            spawns = sorted(rest + spawns, key=lambda spawn: spawn.frame)
+        self.schedule = spawns
+        self.cursor = 0
+
+    def update(self, frame, level):
+        """Spawns enemies due in frame, returns how many were created."""
+        if level != self.level:
+            self.start(level, frame)
+        schedule = self.schedule
+        tracks = EnemyFactory.enemy_tracks
+        spawned = 0
+        while self.cursor < len(schedule) and \
+                schedule[self.cursor].frame <= frame:
+            spawn = schedule[self.cursor]
+            self.cursor += 1
+            if EnemyFactory.spawn(spawn.enemy, tracks[spawn.lane],
+                                  spawn.multiplier):
+                spawned += 1
+        return spawned